@@ -1,19 +1,24 @@
-import os
 import json
 import asyncio
-import shutil
+import logging
 import argparse
 from typing import List
 from pydantic import BaseModel, Field
 from dataclasses import dataclass
 from crawl4ai import AsyncWebCrawler
 from pydantic_ai import Agent, RunContext
-import fitz
 
-from utils.subtitles_generator import generate_audio_and_subtitle
-from utils.image_downloader import download_image
-from utils.image_generator import generate_image
-from utils.video_generator import preprocess_images, create_video_with_audio_and_subtitles
+from utils.batch import run_batch, BATCH_CONCURRENCY
+from utils.crawler_pool import crawler_pool
+from utils.cache import script_cache, cache_key, text_digest, cache_stats
+from utils.pdf_extractor import extract_pdf
+from utils.summarizer import condense_source
+from utils.scene_pipeline import build_video
+from utils.video_generator import RENDER_PROFILE, RENDER_PROFILES
+from utils.workspace import JobContext, create_job_context, cleanup_job_context
+from utils.telemetry import configure_logging, span, start_job_report
+
+logger = logging.getLogger(__name__)
 
 class Scene(BaseModel):
     scene_number: int = Field(..., description="The sequential number of the scene.")
@@ -57,8 +62,11 @@ class Deps:
     client: AsyncWebCrawler
     content: str
 
+MODEL = 'openai:gpt-4o-mini'
+USER_PROMPT = 'Crawl the webpage of a given URL and do your job'
+
 agent = Agent(
-    model='openai:gpt-4o-mini',
+    model=MODEL,
     system_prompt=system_prompt,
     result_type=ScrollaShortsScript,
     deps_type=Deps,
@@ -75,60 +83,82 @@ async def web_crawler(ctx: RunContext[Deps]) -> str:
     )
     return result.markdown
 
-def extract_text_from_pdf(pdf_path):
-    """Extract text from a PDF file, ignoring images."""
-    doc = fitz.open(pdf_path)
-    text = ""
-    for page_num in range(len(doc)):
-        page = doc.load_page(page_num)
-        text += page.get_text("text")  # text only, no images
-    return text
-
-async def process_content(content: str, content_type: str):
-    async with AsyncWebCrawler() as crawler:
-        if content_type == 'url':
-            deps = Deps(client=crawler, content=content)
-        elif content_type == 'pdf':
-            text_content = extract_text_from_pdf(content)
-            deps = Deps(client=None, content=text_content)
+async def process_content(content: str, content_type: str, ctx: JobContext = None, progress=None,
+                          profile: str = RENDER_PROFILE):
+    progress = progress or (lambda stage: None)
+    report = start_job_report()
+
+    progress('ingest')
+    if content_type == 'url':
+        with span("crawl") as record:
+            crawl_result = await crawler_pool.crawl(content)
+            source_text = crawl_result.markdown or ""
+            record["chars"] = len(source_text)
+    elif content_type == 'pdf':
+        with span("pdf_extract") as record:
+            extraction = await asyncio.to_thread(extract_pdf, content)
+            record.update(pages=extraction.pages_read, chars=len(extraction.text))
+        logger.info("Extracted %d/%d pages (%d chars) in %.2fs%s",
+                    extraction.pages_read, extraction.page_count, len(extraction.text), extraction.seconds,
+                    " [truncated to budget]" if extraction.truncated else "")
+        source_text = extraction.text
+    else:
+        raise ValueError("Unsupported content type. Use -url or -pdf.")
+
+    ctx = ctx or create_job_context()
+
+    script_key = cache_key(text_digest(source_text), MODEL, system_prompt, USER_PROMPT)
+    progress('script')
+    with span("script") as record:
+        json_output = script_cache.get_text(script_key)
+        record["cache_hit"] = json_output is not None
+        if json_output is None:
+            with span("summarize"):
+                brief = await condense_source(source_text)
+            deps = Deps(client=None, content=brief)
+            result = await agent.run(USER_PROMPT, deps=deps)
+            scenes = result.data.scenes
+            json_output = json.dumps([scene.model_dump() for scene in scenes], indent=2)
+            script_cache.put_text(script_key, json_output)
         else:
-            raise ValueError("Unsupported content type. Use -url or -pdf.")
-
-        result = await agent.run('Crawl the webpage of a given URL and do your job', deps=deps)
-        scenes = result.data.scenes
-        json_output = json.dumps([scene.model_dump() for scene in scenes], indent=2)
-        print(json_output)
-
-        urls = []
-        for item in json.loads(json_output):
-            print(f"Generating image for scene {item['scene_number']}")
-            url = generate_image(item['image_prompt'])
-            urls.append({"url": url, "scene": item['scene_number']})
-
-        generate_audio_and_subtitle(json.loads(json_output))
-
-        for item in urls:
-            print(f"Downloading image for scene {item['scene']}")
-            download_image(item['url'], f"image{item['scene']}")
-
-    input_dir = "images"
-    output_dir = "images_processed"
-    audio_dir = "audios"
-    output_video = "output_video.mp4"
-
-    os.makedirs('images_processed', exist_ok=True)
-    preprocess_images(input_dir, output_dir)
-    create_video_with_audio_and_subtitles(output_dir, audio_dir, output_video)
-    shutil.rmtree(output_dir, ignore_errors=True)
-
-async def main(content_type: str, contents: List[str]):
-    for content in contents:
-        await process_content(content, content_type)
+            logger.info("Script served from cache")
+    logger.debug("Script: %s", json_output)
+
+    await build_video(json.loads(json_output), ctx, progress, profile=profile)
+    cleanup_job_context(ctx)
+    logger.info("Timings for %s: %s", content, json.dumps(report.summary()["stages"]))
+
+    return ctx.output_video
+
+async def process_batch(contents: List[str], content_type: str, concurrency: int = BATCH_CONCURRENCY,
+                        profile: str = RENDER_PROFILE):
+    """
+    Process several documents concurrently; URL crawls share the process-wide
+    crawler pool. Yields (index, content, result, error) as each finishes.
+    """
+    async for outcome in run_batch(
+            contents, lambda content: process_content(content, content_type, profile=profile), concurrency):
+        yield outcome
+
+async def main(content_type: str, contents: List[str], concurrency: int = BATCH_CONCURRENCY,
+               profile: str = RENDER_PROFILE):
+    async for _, content, output_video, error in process_batch(contents, content_type, concurrency, profile):
+        if error:
+            print(f"Failed to process {content}: {error}")
+        else:
+            print(f"Finished {content}: {output_video}")
+    await asyncio.to_thread(crawler_pool.shutdown)
+    print(f"Cache stats: {json.dumps(cache_stats())}")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Generate YouTube Shorts script from URL or PDF.")
     parser.add_argument('content_type', type=str, choices=['url', 'pdf'], help="Type of content: url or pdf.")
     parser.add_argument('contents', nargs='+', help="URL or path to PDF files.")
+    parser.add_argument('--concurrency', type=int, default=BATCH_CONCURRENCY,
+                        help="Number of inputs to process at the same time.")
+    parser.add_argument('--profile', choices=list(RENDER_PROFILES), default=RENDER_PROFILE,
+                        help=f"Render profile: {', '.join(RENDER_PROFILES)}.")
     args = parser.parse_args()
+    configure_logging()
 
-    asyncio.run(main(args.content_type, args.contents))
\ No newline at end of file
+    asyncio.run(main(args.content_type, args.contents, args.concurrency, args.profile))
\ No newline at end of file
@@ -0,0 +1,369 @@
+"""
+Offline end-to-end benchmark with the paid providers replaced by local stand-ins.
+
+The OpenAI agents, the images endpoint, Deepgram and crawl4ai are swapped for
+stubs that answer after a configurable latency with a canned script,
+placeholder PNGs and silent MP3s, so the real pipeline (caches, HTTP client,
+captions, overlays and ffmpeg renders) runs on a plain Linux box with no keys.
+
+Every scenario runs in a fresh process with empty caches and reports wall time,
+CPU time (this process and its ffmpeg children), peak RSS and seconds per stage.
+
+    python benchmark.py --scenes 3 6 12 --concurrency 1 2 4
+    python benchmark.py --kinds render --render-modes single_pass segments --output bench.json
+"""
+import io
+import os
+import sys
+import json
+import time
+import base64
+import asyncio
+import hashlib
+import argparse
+import resource
+import tempfile
+import subprocess
+from functools import lru_cache
+from types import SimpleNamespace
+
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+
+KINDS = ["pipeline", "render"]
+# Silent MPEG-1 Layer III frame: 128 kbps, 44.1 kHz, mono, zeroed side info and data
+MP3_FRAME = bytes([0xFF, 0xFB, 0x90, 0xC4]) + bytes(413)
+MP3_FRAME_SECONDS = 1152 / 44100
+# Speaking rate of the stub TTS, close to Deepgram Aura's
+WORDS_PER_SECOND = 2.6
+
+SENTENCES = [
+    "Researchers unveiled a new battery that charges in under five minutes.",
+    "The design swaps graphite for a silicon lattice, doubling its capacity.",
+    "Early tests show it keeps ninety percent of its charge after a thousand cycles.",
+    "Manufacturers say the first phones using it could ship next year.",
+    "Critics warn that scaling production is still the hardest part.",
+    "Meanwhile, regulators are drafting new rules for recycling the cells.",
+]
+
+
+def canned_script(scene_count, tag):
+    """
+    A script of scene_count scenes; `tag` makes every job's text and prompts
+    unique so concurrent jobs never share cache entries
+    """
+    return [
+        {
+            "scene_number": number,
+            "text": f"{SENTENCES[(number - 1) % len(SENTENCES)]} {SENTENCES[number % len(SENTENCES)]}",
+            "image_prompt": f"Editorial illustration {tag}-{number}: {SENTENCES[(number - 1) % len(SENTENCES)]}",
+            "timeframe": 5,
+        }
+        for number in range(1, scene_count + 1)
+    ]
+
+
+def silent_mp3(seconds):
+    return MP3_FRAME * max(1, round(seconds / MP3_FRAME_SECONDS))
+
+
+@lru_cache(maxsize=256)
+def placeholder_png(label, size):
+    """
+    A flat-colour PNG of `size` ("WxH") with the label written on it
+    """
+    from PIL import Image, ImageDraw
+
+    width, height = (int(value) for value in size.split("x"))
+    digest = hashlib.sha256(label.encode("utf-8")).digest()
+    image = Image.new("RGB", (width, height), tuple(64 + byte % 128 for byte in digest[:3]))
+    ImageDraw.Draw(image).text((width // 10, height // 3), label[:40], fill="white")
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG", compress_level=1)
+    return buffer.getvalue()
+
+
+class StubProviderAdapter(BaseAdapter):
+    """
+    requests transport answering the images, TTS and STT endpoints locally.
+    Each response is delayed by the provider's latency on the calling thread,
+    as a real round trip would be.
+    """
+
+    IMAGE_HOST = "https://images.stub.invalid/"
+
+    def __init__(self, image_latency, tts_latency):
+        super().__init__()
+        self.image_latency = image_latency
+        self.tts_latency = tts_latency
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        url = request.url
+        if url.endswith("/images/generations"):
+            time.sleep(self.image_latency)
+            payload = json.loads(request.body)
+            label = hashlib.sha256(payload["prompt"].encode("utf-8")).hexdigest()[:16]
+            if payload["response_format"] == "b64_json":
+                image = base64.b64encode(placeholder_png(label, payload["size"])).decode("ascii")
+                data = {"b64_json": image}
+            else:
+                data = {"url": f"{self.IMAGE_HOST}{label}/{payload['size']}.png"}
+            return self.respond(request, 200, "application/json", json.dumps({"data": [data]}).encode())
+        if url.startswith(self.IMAGE_HOST):
+            label, size = url[len(self.IMAGE_HOST):-len(".png")].split("/")
+            return self.respond(request, 200, "image/png", placeholder_png(label, size))
+        if "/v1/speak" in url:
+            time.sleep(self.tts_latency)
+            words = len(request.body.decode("utf-8").split())
+            return self.respond(request, 200, "audio/mpeg", silent_mp3(words / WORDS_PER_SECOND))
+        if "/v1/listen" in url:
+            # No transcript, so captions fall back to proportional timings
+            time.sleep(self.tts_latency)
+            body = {"results": {"channels": [{"alternatives": [{"words": []}]}]}}
+            return self.respond(request, 200, "application/json", json.dumps(body).encode())
+        return self.respond(request, 404, "text/plain", b"not stubbed")
+
+    @staticmethod
+    def respond(request, status, content_type, body):
+        response = requests.Response()
+        response.status_code = status
+        response.headers = CaseInsensitiveDict({"Content-Type": content_type, "Content-Length": str(len(body))})
+        response.raw = io.BytesIO(body)
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self):
+        pass
+
+
+class StubAgent:
+    """
+    Stand-in for a pydantic_ai Agent: run() answers with make_result(prompt, deps)
+    """
+
+    def __init__(self, make_result, latency):
+        self.make_result = make_result
+        self.latency = latency
+
+    async def run(self, prompt, deps=None):
+        await asyncio.sleep(self.latency)
+        return SimpleNamespace(data=self.make_result(prompt, deps))
+
+
+def install_provider_stubs(spec):
+    """
+    Route every provider call of this process to the local stand-ins
+    """
+    from utils.http_client import get_session
+
+    adapter = StubProviderAdapter(spec["image_latency"], spec["tts_latency"])
+    session = get_session()
+    for prefix in ("https://api.openai.com/", "https://api.deepgram.com/", StubProviderAdapter.IMAGE_HOST):
+        session.mount(prefix, adapter)
+
+    if spec["kind"] != "pipeline":
+        return
+
+    import agent as cli
+    from utils import summarizer
+    from utils.cache import text_digest
+    from utils.crawler_pool import crawler_pool
+
+    async def crawl(url):
+        await asyncio.sleep(spec["crawl_latency"])
+        markdown = f"# Article {url}\n\n" + "\n\n".join(SENTENCES * spec["source_repeat"])
+        return SimpleNamespace(markdown=markdown, success=True)
+
+    def script(prompt, deps):
+        scenes = canned_script(spec["scenes"], text_digest(deps.content)[:8])
+        return cli.ScrollaShortsScript(scenes=[cli.Scene(**scene) for scene in scenes])
+
+    crawler_pool.crawl = crawl
+    cli.agent = StubAgent(script, spec["llm_latency"])
+    summarizer.chunk_agent = StubAgent(lambda prompt, deps: prompt[:600], spec["llm_latency"])
+    summarizer.reduce_agent = StubAgent(lambda prompt, deps: prompt[:3000], spec["llm_latency"])
+
+
+def merge_stages(summaries):
+    """
+    Mean seconds per stage across the jobs of a scenario
+    """
+    totals = {}
+    for summary in summaries:
+        for stage, seconds in summary["stages"].items():
+            totals[stage] = totals.get(stage, 0) + seconds
+    return {stage: round(seconds / len(summaries), 3) for stage, seconds in sorted(totals.items())}
+
+
+async def run_pipeline_jobs(spec):
+    import agent as cli
+    from utils.telemetry import current_job_report
+
+    async def job(index):
+        output_video = await cli.process_content(
+            f"https://bench.invalid/article/{index}", "url", profile=spec["profile"])
+        # process_content ran in this task, so its job report is visible here
+        return output_video, current_job_report().summary()
+
+    return await asyncio.gather(*(job(index) for index in range(spec["concurrency"])))
+
+
+def prepare_render_jobs(spec):
+    """
+    One workspace per job with its images, audio and timeline generated
+    through the stubs, ready to render
+    """
+    from utils.scene_pipeline import generate_scene_assets
+    from utils.workspace import create_job_context
+
+    contexts = [create_job_context() for _ in range(spec["concurrency"])]
+    for ctx in contexts:
+        asyncio.run(generate_scene_assets(canned_script(spec["scenes"], ctx.job_id[:8]), ctx))
+    return contexts
+
+
+def run_render_jobs(spec, contexts):
+    """
+    Render every prepared workspace at once with create_video_with_audio_and_subtitles
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from utils.telemetry import span, start_job_report, submit_in_context
+    from utils.video_generator import create_video_with_audio_and_subtitles
+
+    def render(ctx):
+        report = start_job_report()
+        with span("render", mode=spec["render_mode"]):
+            create_video_with_audio_and_subtitles(ctx, spec["render_mode"], spec["profile"])
+        return ctx.output_video, report.summary()
+
+    with ThreadPoolExecutor(max_workers=len(contexts)) as executor:
+        futures = [submit_in_context(executor, render, ctx) for ctx in contexts]
+        return [future.result() for future in futures]
+
+
+def run_scenario(spec):
+    """
+    Run one scenario in this process and return its measurements
+    """
+    from utils.telemetry import configure_logging
+
+    configure_logging(spec["log_level"])
+    install_provider_stubs(spec)
+    # Render runs only time the render; their assets are made beforehand
+    contexts = prepare_render_jobs(spec) if spec["kind"] == "render" else None
+
+    self_before = resource.getrusage(resource.RUSAGE_SELF)
+    children_before = resource.getrusage(resource.RUSAGE_CHILDREN)
+    started = time.perf_counter()
+    if spec["kind"] == "pipeline":
+        outcomes = asyncio.run(run_pipeline_jobs(spec))
+    else:
+        outcomes = run_render_jobs(spec, contexts)
+    wall = time.perf_counter() - started
+    self_after = resource.getrusage(resource.RUSAGE_SELF)
+    children_after = resource.getrusage(resource.RUSAGE_CHILDREN)
+
+    def cpu(before, after):
+        return round(after.ru_utime - before.ru_utime + after.ru_stime - before.ru_stime, 3)
+
+    return dict(
+        spec,
+        wall_seconds=round(wall, 3),
+        cpu_seconds=cpu(self_before, self_after),
+        ffmpeg_cpu_seconds=cpu(children_before, children_after),
+        # ru_maxrss is in kilobytes on Linux
+        peak_rss_mb=round(self_after.ru_maxrss / 1024, 1),
+        ffmpeg_peak_rss_mb=round(children_after.ru_maxrss / 1024, 1),
+        videos=sum(1 for output_video, _ in outcomes if output_video and os.path.exists(output_video)),
+        stages=merge_stages([summary for _, summary in outcomes]),
+    )
+
+
+def spawn_scenario(spec, workdir):
+    """
+    Run a scenario in a child process with its own empty cache and jobs dirs,
+    so caches, RSS and CPU counters never carry over between scenarios
+    """
+    root = tempfile.mkdtemp(prefix=f"{spec['kind']}-", dir=workdir)
+    env = dict(
+        os.environ,
+        SCROLLA_CACHE_DIR=os.path.join(root, "cache"),
+        SCROLLA_JOBS_DIR=os.path.join(root, "jobs"),
+        SCROLLA_RENDER_MODE=spec["render_mode"],
+        SCROLLA_ENCODER_BENCHMARK="0",
+    )
+    env.setdefault("OPENAI_API_KEY", "stub")
+    env.setdefault("DEEPGRAM_API_KEY", "stub")
+    result = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--scenario", json.dumps(spec)],
+        cwd=os.path.dirname(os.path.abspath(__file__)), env=env, stdout=subprocess.PIPE, text=True)
+    lines = result.stdout.strip().splitlines()
+    if result.returncode != 0 or not lines:
+        return dict(spec, error=f"exited with status {result.returncode}")
+    return json.loads(lines[-1])
+
+
+def print_result(result):
+    label = f"{result['kind']:<8} {result['render_mode']:<11} scenes={result['scenes']:<3} jobs={result['concurrency']:<2}"
+    if "error" in result:
+        print(f"{label} FAILED ({result['error']})")
+        return
+    print(f"{label} wall {result['wall_seconds']:7.2f}s  cpu {result['cpu_seconds']:6.2f}s  "
+          f"ffmpeg cpu {result['ffmpeg_cpu_seconds']:6.2f}s  rss {result['peak_rss_mb']:6.1f} MB  "
+          f"ffmpeg rss {result['ffmpeg_peak_rss_mb']:6.1f} MB  videos {result['videos']}/{result['concurrency']}")
+    print("    " + ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in result["stages"].items()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Scrolla pipeline offline with stubbed providers.")
+    parser.add_argument('--kinds', nargs='+', choices=KINDS, default=KINDS,
+                        help="pipeline: process_content end to end, render: create_video_with_audio_and_subtitles only.")
+    parser.add_argument('--scenes', nargs='+', type=int, default=[3, 6, 12], help="Scene counts to run.")
+    parser.add_argument('--concurrency', nargs='+', type=int, default=[1, 2],
+                        help="Number of jobs run at the same time.")
+    parser.add_argument('--render-modes', nargs='+', choices=["single_pass", "segments", "streaming"],
+                        default=["single_pass"], help="Render modes (streaming applies to pipeline runs only).")
+    parser.add_argument('--profile', default="fast-preview", help="Render profile.")
+    parser.add_argument('--llm-latency', type=float, default=1.0, help="Seconds per stubbed LLM call.")
+    parser.add_argument('--image-latency', type=float, default=2.0, help="Seconds per stubbed image generation.")
+    parser.add_argument('--tts-latency', type=float, default=0.5, help="Seconds per stubbed TTS call.")
+    parser.add_argument('--crawl-latency', type=float, default=0.5, help="Seconds per stubbed crawl.")
+    parser.add_argument('--source-repeat', type=int, default=20,
+                        help="Copies of the canned article text (raise it to exercise summarization).")
+    parser.add_argument('--log-level', default="WARNING", help="Log level of the benchmarked runs.")
+    parser.add_argument('--output', help="Write every result to this JSON file.")
+    parser.add_argument('--scenario', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.scenario:
+        print(json.dumps(run_scenario(json.loads(args.scenario))))
+        return
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="scrolla-bench-") as workdir:
+        for kind in args.kinds:
+            for render_mode in args.render_modes:
+                if kind == "render" and render_mode == "streaming":
+                    continue
+                for scenes in args.scenes:
+                    for concurrency in args.concurrency:
+                        spec = {
+                            "kind": kind, "render_mode": render_mode, "scenes": scenes,
+                            "concurrency": concurrency, "profile": args.profile,
+                            "llm_latency": args.llm_latency, "image_latency": args.image_latency,
+                            "tts_latency": args.tts_latency, "crawl_latency": args.crawl_latency,
+                            "source_repeat": args.source_repeat, "log_level": args.log_level,
+                        }
+                        result = spawn_scenario(spec, workdir)
+                        print_result(result)
+                        results.append(result)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,33 @@
 import sys
-from flask import Flask, request, jsonify, abort
+from flask import Flask, Response, request, jsonify, abort
 import os
 import json
 import asyncio
-import shutil
+import queue
+import threading
+import uuid
+import logging
 from typing import List
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, ValidationError
 from dataclasses import dataclass
 from crawl4ai import AsyncWebCrawler
 from pydantic_ai import Agent, RunContext
-import fitz
 
-from utils.subtitles_generator import generate_audio_and_subtitle
-from utils.image_downloader import download_image
-from utils.image_generator import generate_image
-from utils.video_generator import preprocess_images, create_video_with_audio_and_subtitles
+from utils.batch import run_batch, BATCH_CONCURRENCY
+from utils.crawler_pool import crawler_pool
+from utils.cache import script_cache, cache_key, text_digest, cache_stats
+from utils.pdf_extractor import extract_pdf
+from utils.summarizer import condense_source
+from utils.scene_pipeline import build_video, rerender_scenes
+from utils.video_generator import (
+    RENDER_PROFILE, RENDER_PROFILES, VIDEO_WIDTH, VIDEO_HEIGHT, render_profile, prepare_static_assets)
+from utils.encoder import encoder_stats, start_self_benchmark
+from utils.workspace import JobContext, create_job_context, open_job_context, cleanup_job_context
+from utils.job_queue import JobQueue, JobBusy, QueueFull
+from utils.telemetry import configure_logging, metrics, span, start_job_report
+
+configure_logging()
+logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 
@@ -63,8 +76,11 @@ class Deps:
     client: AsyncWebCrawler
     content: str
 
+MODEL = 'openai:gpt-4o-mini'
+USER_PROMPT = 'Crawl the webpage of a given URL and do your job'
+
 agent = Agent(
-    model='openai:gpt-4o-mini',
+    model=MODEL,
     system_prompt=system_prompt,
     result_type=ScrollaShortsScript,
     deps_type=Deps,
@@ -81,57 +97,195 @@ async def web_crawler(ctx: RunContext[Deps]) -> str:
     )
     return result.markdown
 
-def extract_text_from_pdf(pdf_path):
-    """Extract text from a PDF file, ignoring images."""
-    doc = fitz.open(pdf_path)
-    text = ""
-    for page_num in range(len(doc)):
-        page = doc.load_page(page_num)
-        text += page.get_text("text")  # text only, no images
-    return text
-
-async def process_content(content: str, content_type: str):
-    async with AsyncWebCrawler() as crawler:
-        if content_type == 'url':
-            deps = Deps(client=crawler, content=content)
-        elif content_type == 'pdf':
-            text_content = extract_text_from_pdf(content)
-            deps = Deps(client=None, content=text_content)
+async def process_content(content: str, content_type: str, ctx: JobContext = None, progress=None,
+                          profile: str = RENDER_PROFILE):
+    progress = progress or (lambda stage: None)
+    report = start_job_report()
+
+    progress('ingest')
+    extraction = None
+    if content_type == 'url':
+        with span("crawl") as record:
+            crawl_result = await crawler_pool.crawl(content)
+            source_text = crawl_result.markdown or ""
+            record["chars"] = len(source_text)
+    elif content_type == 'pdf':
+        with span("pdf_extract") as record:
+            extraction = await asyncio.to_thread(extract_pdf, content)
+            record.update(pages=extraction.pages_read, chars=len(extraction.text))
+        logger.info("Extracted %d/%d pages (%d chars) in %.2fs%s",
+                    extraction.pages_read, extraction.page_count, len(extraction.text), extraction.seconds,
+                    " [truncated to budget]" if extraction.truncated else "")
+        source_text = extraction.text
+    else:
+        raise ValueError("Unsupported content type. Use 'url' or 'pdf'.")
+
+    ctx = ctx or create_job_context()
+
+    script_key = cache_key(text_digest(source_text), MODEL, system_prompt, USER_PROMPT)
+    progress('script')
+    with span("script") as record:
+        json_output = script_cache.get_text(script_key)
+        record["cache_hit"] = json_output is not None
+        if json_output is None:
+            with span("summarize"):
+                brief = await condense_source(source_text)
+            deps = Deps(client=None, content=brief)
+            result = await agent.run(USER_PROMPT, deps=deps)
+            scenes = result.data.scenes
+            json_output = json.dumps([scene.model_dump() for scene in scenes], indent=2)
+            script_cache.put_text(script_key, json_output)
         else:
-            raise ValueError("Unsupported content type. Use 'url' or 'pdf'.")
+            logger.info("Script served from cache")
+    logger.debug("Script: %s", json_output)
+
+    render_report = await build_video(json.loads(json_output), ctx, progress, profile=profile)
+    cleanup_job_context(ctx)
+
+    return {
+        "job_id": ctx.job_id,
+        "output_video": ctx.output_video,
+        "script": json_output,
+        "extraction": extraction.summary() if extraction else None,
+        "render": render_report,
+        "timings": report.summary(),
+    }
+
+async def rerender_content(ctx: JobContext, script: ScrollaShortsScript, progress=None,
+                          profile: str = RENDER_PROFILE):
+    """
+    Re-render a finished job from an edited script; only scenes whose text or
+    image prompt changed get new assets and new segments
+    """
+    report = start_job_report()
+    scenes = [scene.model_dump() for scene in script.scenes]
+    render_report = await rerender_scenes(scenes, ctx, progress, profile=profile)
+    cleanup_job_context(ctx)
+
+    return {
+        "job_id": ctx.job_id,
+        "output_video": ctx.output_video,
+        "script": json.dumps(scenes, indent=2),
+        "render": render_report,
+        "timings": report.summary(),
+    }
+
+async def run_job(job_id, payload, progress):
+    if payload['type'] == 'rerender':
+        ctx = open_job_context(job_id)
+        if ctx is None:
+            raise Exception(f"No workspace left for job {job_id}")
+        script = ScrollaShortsScript.model_validate({"scenes": payload['scenes']})
+        return await rerender_content(ctx, script, progress, payload.get('profile', RENDER_PROFILE))
+
+    ctx = create_job_context(job_id)
+    return await process_content(
+        payload['content'], payload['type'], ctx, progress, payload.get('profile', RENDER_PROFILE))
+
+job_queue = JobQueue(run_job)
+
+
+def collect_service_metrics():
+    samples = [("scrolla_jobs_queued", "gauge", "Jobs waiting for a worker", {}, job_queue.pending())]
+    for namespace, stats in cache_stats().items():
+        samples.append(("scrolla_cache_hits", "gauge", "Cache hits since start", {"cache": namespace}, stats["hits"]))
+        samples.append(("scrolla_cache_misses", "gauge", "Cache misses since start",
+                        {"cache": namespace}, stats["misses"]))
+    return samples
+
+
+metrics.register_collector(collect_service_metrics)
+
+_services_started = False
+_services_lock = threading.Lock()
+
+def start_services():
+    """
+    Start the job workers (restoring persisted jobs), the encoder self-benchmark
+    and static asset preparation, once per server process. Never called at
+    import, so PDF worker processes that re-import this module stay idle.
+    """
+    global _services_started
+    with _services_lock:
+        if _services_started:
+            return
+        _services_started = True
+    job_queue.start()
+    start_self_benchmark({name: render_profile(name) for name in RENDER_PROFILES}, VIDEO_WIDTH, VIDEO_HEIGHT)
+    threading.Thread(target=prepare_static_assets, name="static-assets", daemon=True).start()
+
+@app.before_request
+def ensure_services():
+    # Servers that import the app instead of running this file start them here
+    start_services()
+
+async def process_batch(contents: List[str], content_type: str, concurrency: int = BATCH_CONCURRENCY):
+    """
+    Process several documents concurrently; URL crawls share the process-wide
+    crawler pool. Yields (index, content, result, error) as each finishes.
+    """
+    async for outcome in run_batch(
+            contents, lambda content: process_content(content, content_type), concurrency):
+        yield outcome
+
+def stream_batch(contents: List[str], content_type: str):
+    """
+    Run a batch on a background event loop and yield one NDJSON line per
+    document as soon as it finishes.
+    """
+    outcomes = queue.Queue()
+
+    async def produce():
+        async for index, content, result, error in process_batch(contents, content_type):
+            outcomes.put({
+                "index": index,
+                "source": os.path.basename(content),
+                "result": result,
+                "error": str(error) if error else None,
+            })
+
+    def run():
+        try:
+            asyncio.run(produce())
+        finally:
+            outcomes.put(None)
+
+    threading.Thread(target=run, daemon=True).start()
+    while (outcome := outcomes.get()) is not None:
+        yield json.dumps(outcome) + "\n"
+
+def save_uploaded_pdfs(files):
+    pdf_paths = []
+    for file in files:
+        pdf_path = os.path.join('uploads', f"{uuid.uuid4().hex}_{os.path.basename(file.filename)}")
+        os.makedirs('uploads', exist_ok=True)
+        file.save(pdf_path)
+        pdf_paths.append(pdf_path)
+    return pdf_paths
 
-        result = await agent.run('Crawl the webpage of a given URL and do your job', deps=deps)
-        scenes = result.data.scenes
-        json_output = json.dumps([scene.model_dump() for scene in scenes], indent=2)
-        print(json_output)
+@app.route('/')
+def home():
+    return "Welcome to Scrolla!"
 
-        urls = []
-        for item in json.loads(json_output):
-            print(f"Generating image for scene {item['scene_number']}")
-            url = generate_image(item['image_prompt'])
-            urls.append({"url": url, "scene": item['scene_number']})
 
-        generate_audio_and_subtitle(json.loads(json_output))
+@app.route('/cache/stats')
+def cache_stats_route():
+    return jsonify(cache_stats()), 200
 
-        for item in urls:
-            print(f"Downloading image for scene {item['scene']}")
-            download_image(item['url'], f"image{item['scene']}")
 
-    input_dir = "images"
-    output_dir = "images_processed"
-    audio_dir = "audios"
-    output_video = "output_video.mp4"
+@app.route('/crawler/stats')
+def crawler_stats_route():
+    return jsonify(crawler_pool.stats()), 200
 
-    os.makedirs('images_processed', exist_ok=True)
-    preprocess_images(input_dir, output_dir)
-    create_video_with_audio_and_subtitles(output_dir, audio_dir, output_video)
-    shutil.rmtree(output_dir, ignore_errors=True)
 
-    return json_output
+@app.route('/encoder/stats')
+def encoder_stats_route():
+    return jsonify(encoder_stats()), 200
 
-@app.route('/')
-def home():
-    return "Welcome to Scrolla!"
+
+@app.route('/metrics')
+def metrics_route():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
 
 
 @app.route('/process', methods=['POST'])
@@ -149,23 +303,117 @@ async def process():
         if not files:
             abort(400, description="At least one PDF file is required for PDF processing.")
 
-        pdf_paths = []
-        for file in files:
-            pdf_path = os.path.join('uploads', file.filename)
-            os.makedirs('uploads', exist_ok=True)
-            file.save(pdf_path)
-            pdf_paths.append(pdf_path)
+        pdf_paths = save_uploaded_pdfs(files)
 
-        results = []
-        for pdf_path in pdf_paths:
-            result = await process_content(pdf_path, content_type)
-            results.append(result)
-
-        return jsonify(results), 200
+        return Response(stream_batch(pdf_paths, content_type), mimetype='application/x-ndjson')
     else:
         abort(400, description="Invalid content type. Use 'url' or 'pdf'.")
 
     return jsonify({"result": result}), 200
 
+
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    """Queue a URL or up to 5 PDFs (one job each) and return immediately"""
+    content_type = request.form.get('type')
+    profile = request.form.get('profile', RENDER_PROFILE)
+    if profile not in RENDER_PROFILES:
+        abort(400, description=f"Unknown render profile. Use one of: {', '.join(RENDER_PROFILES)}.")
+    if content_type == 'url':
+        url = request.form.get('url')
+        if not url:
+            abort(400, description="URL is required for URL processing.")
+        payloads = [{"type": content_type, "content": url, "profile": profile}]
+    elif content_type == 'pdf':
+        files = request.files.getlist('pdfs')
+        if len(files) > 5:
+            abort(400, description="A maximum of 5 PDF files are allowed.")
+        if not files:
+            abort(400, description="At least one PDF file is required for PDF processing.")
+        if job_queue.pending() + len(files) > job_queue.max_queue:
+            return jsonify({"error": "Job queue is full, retry later."}), 503, {"Retry-After": "30"}
+        payloads = [{"type": content_type, "content": path, "profile": profile}
+                    for path in save_uploaded_pdfs(files)]
+    else:
+        abort(400, description="Invalid content type. Use 'url' or 'pdf'.")
+
+    try:
+        job_ids = job_queue.submit_many(payloads)
+    except QueueFull:
+        return jsonify({"error": "Job queue is full, retry later."}), 503, {"Retry-After": "30"}
+
+    return jsonify({"job_ids": job_ids}), 202
+
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        abort(404, description="Unknown job.")
+    return jsonify({
+        "job_id": job["id"],
+        "status": job["status"],
+        "stage": job["stage"],
+        "stages": job["stages"],
+        "error": job["error"],
+    }), 200
+
+
+@app.route('/jobs/<job_id>/rerender', methods=['POST'])
+def rerender_job(job_id):
+    """
+    Queue a re-render of a finished job from an edited script (the `script` of
+    its result, as a list of scenes or {"scenes": [...], "profile": ...}) and
+    return immediately; progress and the new result are served under the same
+    job id. Scenes whose text and image prompt are unchanged reuse their assets
+    and encoded segments.
+    """
+    job = job_queue.get(job_id)
+    if job is not None and job["status"] in ("queued", "running"):
+        return jsonify({"error": "Job is still in progress."}), 409
+    if open_job_context(job_id) is None:
+        abort(404, description="Unknown job.")
+
+    payload = request.get_json(silent=True)
+    if isinstance(payload, list):
+        payload = {"scenes": payload}
+    if not isinstance(payload, dict):
+        abort(400, description="Send the edited script as JSON.")
+    profile = payload.get('profile', RENDER_PROFILE)
+    if profile not in RENDER_PROFILES:
+        abort(400, description=f"Unknown render profile. Use one of: {', '.join(RENDER_PROFILES)}.")
+    try:
+        script = ScrollaShortsScript.model_validate({"scenes": payload.get("scenes")})
+    except ValidationError as e:
+        abort(400, description=f"Invalid script: {e}")
+
+    try:
+        job_queue.resubmit(job_id, {
+            "type": "rerender",
+            "scenes": [scene.model_dump() for scene in script.scenes],
+            "profile": profile,
+        })
+    except JobBusy:
+        return jsonify({"error": "Job is still in progress."}), 409
+    except QueueFull:
+        return jsonify({"error": "Job queue is full, retry later."}), 503, {"Retry-After": "30"}
+
+    return jsonify({"job_id": job_id}), 202
+
+
+@app.route('/jobs/<job_id>/result')
+def job_result(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        abort(404, description="Unknown job.")
+    if job["status"] == "failed":
+        return jsonify({"job_id": job_id, "status": "failed", "error": job["error"]}), 500
+    if job["status"] != "done":
+        return jsonify({"job_id": job_id, "status": job["status"], "stage": job["stage"]}), 409
+    return jsonify({"job_id": job_id, "status": "done", "result": job["result"]}), 200
+
 if __name__ == "__main__":
+    # With the debug reloader only the serving child (WERKZEUG_RUN_MAIN) starts them
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        start_services()
     app.run(debug=True, port=8000)
\ No newline at end of file
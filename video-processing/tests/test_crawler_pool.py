@@ -0,0 +1,58 @@
+import asyncio
+import importlib
+import sys
+import types
+
+import pytest
+
+
+class FakeCrawler:
+    """
+    Stands in for crawl4ai's AsyncWebCrawler and records the pages it served
+    """
+
+    instances = []
+
+    def __init__(self):
+        self.pages = 0
+        self.closed = False
+        FakeCrawler.instances.append(self)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.closed = True
+
+    async def arun(self, url):
+        assert not self.closed
+        self.pages += 1
+        await asyncio.sleep(0.01)
+        return types.SimpleNamespace(success=True, markdown=url)
+
+
+@pytest.fixture
+def crawler_pool(monkeypatch):
+    FakeCrawler.instances = []
+    monkeypatch.setitem(sys.modules, "crawl4ai", types.SimpleNamespace(AsyncWebCrawler=FakeCrawler))
+    module = importlib.reload(importlib.import_module("utils.crawler_pool"))
+    yield module
+    module.crawler_pool.shutdown()
+    sys.modules.pop("utils.crawler_pool", None)
+
+
+@pytest.mark.parametrize("max_pages", [1, 2, 3])
+def test_browsers_are_recycled_after_exactly_recycle_after_pages(crawler_pool, max_pages):
+    pool = crawler_pool.CrawlerPool(size=1, max_pages=max_pages, recycle_after=3, healthcheck_interval=3600)
+
+    async def crawl_all():
+        return await asyncio.gather(*(pool.crawl(f"https://example.com/{n}") for n in range(9)))
+
+    try:
+        results = asyncio.run(crawl_all())
+    finally:
+        pool.shutdown()
+
+    assert len(results) == 9
+    assert [crawler.pages for crawler in FakeCrawler.instances] == [3, 3, 3]
+    assert pool.stats()["browsers_recycled"] == 3
@@ -0,0 +1,110 @@
+import asyncio
+import os
+import subprocess
+
+import pytest
+from PIL import Image
+
+from utils import encoder, scene_pipeline, video_generator
+from utils.workspace import create_job_context
+
+SCRIPT = [
+    {"scene_number": n, "text": f"Scene {n} narration.", "image_prompt": f"Picture {n}", "timeframe": 3}
+    for n in (1, 2, 3)
+]
+
+
+class FakeFFmpeg:
+    """
+    Stands in for subprocess.run: writes each command's output file and records
+    which kind of ffmpeg call it was
+    """
+
+    def __init__(self):
+        self.commands = []
+
+    def __call__(self, command, *args, **kwargs):
+        self.commands.append(command)
+        output = command[-1]
+        if command[0] == "ffmpeg" and not output.startswith("-") and output != "-":
+            with open(output, "wb") as f:
+                f.write(b"\0" * 1024)
+        return subprocess.CompletedProcess(command, 0, stdout="", stderr="")
+
+    def count(self, kind):
+        return sum(1 for command in self.commands if kind(command))
+
+
+def is_segment_encode(command):
+    return "-filter_complex" in command and command[-1].endswith(".part.mp4")
+
+
+def is_cut(command):
+    return "-ss" in command and "copy" in command
+
+
+def write_audio(ctx, scene_number, text):
+    with open(ctx.audio_path(scene_number), "wb") as f:
+        f.write(text.encode("utf-8"))
+    return 3.0, [[0.0, 3.0, text]]
+
+
+@pytest.fixture
+def job(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    ffmpeg = FakeFFmpeg()
+    monkeypatch.setattr(subprocess, "run", ffmpeg)
+    monkeypatch.setattr(encoder, "ENCODER", "libx264")
+    encoder.select_encoder.cache_clear()
+    monkeypatch.setattr(video_generator, "RENDITIONS", [])
+    monkeypatch.setattr(video_generator, "watermark_input", lambda: None)
+    monkeypatch.setattr(video_generator, "music_input", lambda: None)
+    monkeypatch.setattr(
+        scene_pipeline, "synthesize_scene",
+        lambda text, scene_number, ctx: write_audio(ctx, scene_number, text))
+
+    ctx = create_job_context("job", base_dir=str(tmp_path / "jobs"))
+    entries = []
+    for item in SCRIPT:
+        n = item["scene_number"]
+        Image.new("RGB", (64, 96), (n * 40, 0, 0)).save(ctx.image_path(n, ".png"))
+        duration, cues = write_audio(ctx, n, item["text"])
+        entries.append((n, item["text"], duration, cues))
+    scene_pipeline.write_timeline(ctx, entries)
+    scene_pipeline.record_scene_inputs(ctx, SCRIPT)
+
+    profile = video_generator.render_profile("publish")
+    assert video_generator.create_video_single_pass(ctx, profile) is not None
+    yield ctx, ffmpeg
+    encoder.select_encoder.cache_clear()
+
+
+def rerender(ctx, script):
+    return asyncio.run(scene_pipeline.rerender_scenes(script, ctx, profile="publish"))
+
+
+def test_single_pass_job_rerender_encodes_only_the_edited_scene(job):
+    ctx, ffmpeg = job
+    ffmpeg.commands.clear()
+    edited = [dict(item) for item in SCRIPT]
+    edited[1]["text"] = "A different narration for scene two."
+
+    report = rerender(ctx, edited)
+
+    assert ffmpeg.count(is_segment_encode) == 1
+    assert ffmpeg.count(is_cut) == 2
+    assert report["scenes_encoded"] == 1
+    assert report["scenes_reused"] == 2
+
+
+def test_single_pass_job_unchanged_rerender_encodes_nothing(job):
+    ctx, ffmpeg = job
+    ffmpeg.commands.clear()
+
+    rerender(ctx, SCRIPT)
+    assert ffmpeg.count(is_segment_encode) == 0
+
+    ffmpeg.commands.clear()
+    rerender(ctx, SCRIPT)
+    assert ffmpeg.count(is_segment_encode) == 0
+    assert ffmpeg.count(is_cut) == 0
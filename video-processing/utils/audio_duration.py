@@ -0,0 +1,117 @@
+# Bitrates in kbps, indexed by [version is MPEG-1][layer][bitrate index]
+BITRATES = {
+    (True, 1): [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+    (True, 2): [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+    (True, 3): [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    (False, 1): [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+    (False, 2): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    (False, 3): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+
+SAMPLE_RATES = {
+    3: [44100, 48000, 32000],  # MPEG-1
+    2: [22050, 24000, 16000],  # MPEG-2
+    0: [11025, 12000, 8000],   # MPEG-2.5
+}
+
+
+def parse_frame_header(data, offset):
+    """
+    Parse the 4-byte frame header at offset → (frame_length, samples, sample_rate)
+    or None if it is not a valid header.
+    """
+    if offset + 4 > len(data) or data[offset] != 0xFF or (data[offset + 1] & 0xE0) != 0xE0:
+        return None
+
+    version_bits = (data[offset + 1] >> 3) & 0x03
+    layer_bits = (data[offset + 1] >> 1) & 0x03
+    bitrate_index = (data[offset + 2] >> 4) & 0x0F
+    sample_rate_index = (data[offset + 2] >> 2) & 0x03
+    padding = (data[offset + 2] >> 1) & 0x01
+
+    if version_bits == 1 or layer_bits == 0 or bitrate_index in (0, 15) or sample_rate_index == 3:
+        return None
+
+    mpeg1 = version_bits == 3
+    layer = 4 - layer_bits
+    bitrate = BITRATES[(mpeg1, layer)][bitrate_index] * 1000
+    sample_rate = SAMPLE_RATES[version_bits][sample_rate_index]
+
+    if layer == 1:
+        samples = 384
+        frame_length = (12 * bitrate // sample_rate + padding) * 4
+    elif layer == 2 or mpeg1:
+        samples = 1152
+        frame_length = 144 * bitrate // sample_rate + padding
+    else:
+        samples = 576
+        frame_length = 72 * bitrate // sample_rate + padding
+
+    return frame_length, samples, sample_rate
+
+
+def skip_id3v2(data):
+    if data[:3] != b"ID3" or len(data) < 10:
+        return 0
+    size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+    footer = 10 if data[5] & 0x10 else 0
+    return 10 + size + footer
+
+
+def xing_frame_count(data, offset, mpeg1, mono):
+    """
+    Total frame count from a Xing/Info (or VBRI) header in the first frame
+    """
+    side_info = (17 if mono else 32) if mpeg1 else (9 if mono else 17)
+    xing = offset + 4 + side_info
+    if data[xing:xing + 4] in (b"Xing", b"Info"):
+        flags = int.from_bytes(data[xing + 4:xing + 8], "big")
+        if flags & 0x01:
+            return int.from_bytes(data[xing + 8:xing + 12], "big")
+    vbri = offset + 4 + 32
+    if data[vbri:vbri + 4] == b"VBRI":
+        return int.from_bytes(data[vbri + 14:vbri + 18], "big")
+    return None
+
+
+def mp3_duration(audio_path):
+    """
+    Duration in seconds of an MP3 file, or None if no MPEG frames are found.
+
+    Uses the Xing/Info/VBRI frame count when present, otherwise walks every
+    frame header (a linear scan over a file that is already small).
+    """
+    with open(audio_path, "rb") as f:
+        data = f.read()
+
+    offset = skip_id3v2(data)
+    first = None
+    while offset < len(data) - 4:
+        header = parse_frame_header(data, offset)
+        # Require a second valid header right after to rule out false syncs
+        if header and parse_frame_header(data, offset + header[0]):
+            first = header
+            break
+        offset += 1
+
+    if first is None:
+        return None
+
+    frame_length, samples, sample_rate = first
+    mpeg1 = ((data[offset + 1] >> 3) & 0x03) == 3
+    mono = ((data[offset + 3] >> 6) & 0x03) == 3
+    frames = xing_frame_count(data, offset, mpeg1, mono)
+    if frames:
+        return frames * samples / sample_rate
+
+    total_samples = 0
+    while offset < len(data) - 4:
+        header = parse_frame_header(data, offset)
+        if header is None:
+            offset += 1
+            continue
+        frame_length, samples, sample_rate = header
+        total_samples += samples
+        offset += frame_length
+
+    return total_samples / sample_rate
@@ -0,0 +1,49 @@
+import os
+import asyncio
+import logging
+import threading
+
+# Max documents processed at once across the whole process (all requests/batches)
+BATCH_CONCURRENCY = int(os.environ.get("SCROLLA_BATCH_CONCURRENCY", 3))
+
+logger = logging.getLogger(__name__)
+
+# How often a batch item waiting for a process-wide slot checks again (seconds)
+SLOT_POLL_INTERVAL = 0.05
+
+_global_slots = threading.BoundedSemaphore(max(1, BATCH_CONCURRENCY))
+
+
+async def acquire_global_slot():
+    """
+    Take a process-wide slot. The slots are shared by every event loop in the
+    process, so this polls instead of blocking a thread; a waiter that is
+    cancelled never ends up holding a slot.
+    """
+    while not _global_slots.acquire(blocking=False):
+        await asyncio.sleep(SLOT_POLL_INTERVAL)
+
+
+async def run_batch(items, worker, concurrency=BATCH_CONCURRENCY):
+    """
+    Run `await worker(item)` for every item, at most `concurrency` at a time
+    within this batch and at most BATCH_CONCURRENCY across the process.
+
+    Yields (index, item, result, error) tuples in completion order, so callers
+    can stream each result back as soon as it is ready.
+    """
+    local_slots = asyncio.Semaphore(max(1, concurrency))
+
+    async def run(index, item):
+        async with local_slots:
+            await acquire_global_slot()
+            try:
+                return index, item, await worker(item), None
+            except Exception as e:
+                logger.warning("Batch item %s failed: %s", index, e)
+                return index, item, None, e
+            finally:
+                _global_slots.release()
+
+    for next_done in asyncio.as_completed([run(index, item) for index, item in enumerate(items)]):
+        yield await next_done
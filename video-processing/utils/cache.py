@@ -0,0 +1,208 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import threading
+
+CACHE_DIR = os.environ.get("SCROLLA_CACHE_DIR", ".scrolla_cache")
+CACHE_MAX_BYTES = int(os.environ.get("SCROLLA_CACHE_MAX_MB", 2048)) * 1024 * 1024
+CACHE_TTL = int(os.environ.get("SCROLLA_CACHE_TTL", 7 * 24 * 3600))
+
+# Eviction walks the whole cache directory, so it runs at most this often
+EVICT_INTERVAL = 60
+# Prepared static render assets live here; eviction leaves them alone since
+# every render depends on them and they only change with their sources
+ASSET_NAMESPACE = "assets"
+
+
+def cache_key(*parts):
+    """
+    Stable content hash for a tuple of JSON-serializable key parts
+    """
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def text_digest(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def file_digest(path, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class DiskCache:
+    """
+    Content-addressed file cache under CACHE_DIR/<namespace>, evicted by TTL
+    (counted from when an entry was written) and then least-recently-used until
+    the whole cache root fits in max_bytes.
+    """
+
+    _evict_lock = threading.Lock()
+    _last_evict = 0.0
+
+    def __init__(self, namespace, root=CACHE_DIR, max_bytes=CACHE_MAX_BYTES, ttl=CACHE_TTL):
+        self.namespace = namespace
+        self.root = root
+        self.directory = os.path.join(root, namespace)
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _shard(self, key):
+        return os.path.join(self.directory, key[:2])
+
+    def _find(self, key):
+        shard = self._shard(key)
+        if not os.path.isdir(shard):
+            return None
+        for name in os.listdir(shard):
+            if name.split(".", 1)[0] == key:
+                return os.path.join(shard, name)
+        return None
+
+    def _record(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get_path(self, key):
+        """
+        Path of the cached entry for key, or None on a miss / expired entry
+        """
+        path = self._find(key)
+        try:
+            if path and self.ttl and time.time() - os.path.getmtime(path) > self.ttl:
+                os.remove(path)
+                path = None
+        except FileNotFoundError:
+            path = None
+
+        self._record(path is not None)
+        if path is None:
+            return None
+
+        # Mark as recently used for LRU eviction; mtime stays the write time the TTL counts from
+        try:
+            os.utime(path, (time.time(), os.path.getmtime(path)))
+        except FileNotFoundError:
+            pass
+        return path
+
+    def get_file(self, key, dest_path):
+        """
+        Copy the cached entry for key to dest_path. Returns dest_path on a hit.
+        """
+        path = self.get_path(key)
+        if path is None:
+            return None
+        os.makedirs(os.path.dirname(dest_path) or ".", exist_ok=True)
+        shutil.copyfile(path, dest_path)
+        return dest_path
+
+    def put_file(self, key, src_path):
+        """
+        Store a copy of src_path under key, keeping its extension
+        """
+        extension = os.path.splitext(src_path)[1]
+        shard = self._shard(key)
+        os.makedirs(shard, exist_ok=True)
+
+        final_path = os.path.join(shard, f"{key}{extension}")
+        tmp_path = f"{final_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        shutil.copyfile(src_path, tmp_path)
+        os.replace(tmp_path, final_path)
+
+        self.evict()
+        return final_path
+
+    def get_text(self, key):
+        path = self.get_path(key)
+        if path is None:
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read()
+
+    def put_text(self, key, text):
+        shard = self._shard(key)
+        os.makedirs(shard, exist_ok=True)
+
+        final_path = os.path.join(shard, f"{key}.txt")
+        tmp_path = f"{final_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, final_path)
+
+        self.evict()
+        return final_path
+
+    def evict(self, force=False):
+        """
+        Drop entries older than the TTL (by write time), then the least recently
+        used ones (by access time) until the cache root is under max_bytes. Prepared assets and in-progress writes are
+        never removed.
+        """
+        now = time.time()
+        with DiskCache._evict_lock:
+            if not force and now - DiskCache._last_evict < EVICT_INTERVAL:
+                return
+            DiskCache._last_evict = now
+
+            entries = []
+            for dirpath, dirnames, filenames in os.walk(self.root):
+                if dirpath == self.root and ASSET_NAMESPACE in dirnames:
+                    dirnames.remove(ASSET_NAMESPACE)
+                for name in filenames:
+                    if name.endswith(".tmp") or ".part." in name:
+                        continue
+                    path = os.path.join(dirpath, name)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    if self.ttl and now - stat.st_mtime > self.ttl:
+                        os.remove(path)
+                        continue
+                    entries.append((stat.st_atime, stat.st_size, path))
+
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            }
+
+
+script_cache = DiskCache("scripts")
+image_cache = DiskCache("images")
+audio_cache = DiskCache("audio")
+summary_cache = DiskCache("summaries")
+caption_cache = DiskCache("captions")
+
+
+def cache_stats():
+    return {
+        cache.namespace: cache.stats()
+        for cache in (script_cache, image_cache, audio_cache, summary_cache, caption_cache)
+    }
@@ -0,0 +1,109 @@
+import os
+import json
+import logging
+from .cache import caption_cache, cache_key
+from .http_client import request
+from .tts import VOICE_MODEL, headers as tts_headers
+
+logger = logging.getLogger(__name__)
+
+# "phrase": short timed cues of a few words, "scene": one cue per scene
+CAPTION_MODE = os.environ.get("SCROLLA_CAPTION_MODE", "phrase")
+# "proportional": spread each scene's duration over its words by length,
+# "deepgram": word timestamps from transcribing the synthesized audio (one extra
+# Deepgram call per scene, cached), falling back to proportional on mismatch
+CAPTION_TIMING = os.environ.get("SCROLLA_CAPTION_TIMING", "proportional")
+CAPTION_MAX_WORDS = int(os.environ.get("SCROLLA_CAPTION_MAX_WORDS", 4))
+
+STT_MODEL = "nova-2"
+stt_url = f"https://api.deepgram.com/v1/listen?model={STT_MODEL}&punctuate=true"
+
+# Extra weight (in characters) for the pause TTS leaves after punctuation
+PAUSE_WEIGHTS = {",": 2, ";": 2, ":": 2, "-": 1, ".": 4, "!": 4, "?": 4}
+
+
+def word_weight(word):
+    return max(1, len(word.strip(".,;:!?-"))) + PAUSE_WEIGHTS.get(word[-1], 0)
+
+
+def proportional_timings(words, duration):
+    """
+    (start, end) per word, sharing the duration by character count plus a
+    pause allowance after punctuation
+    """
+    weights = [word_weight(word) for word in words]
+    scale = duration / sum(weights)
+    timings = []
+    current = 0.0
+    for weight in weights:
+        timings.append((current, current + weight * scale))
+        current += weight * scale
+    return timings
+
+
+def deepgram_word_timings(text, audio_path, word_count):
+    """
+    (start, end) per word from a Deepgram transcription of the scene's audio, or
+    None if it fails or does not line up word for word with the script
+    """
+    key = cache_key(text, VOICE_MODEL, STT_MODEL)
+    cached = caption_cache.get_text(key)
+    if cached is not None:
+        timings = json.loads(cached)
+    else:
+        try:
+            with open(audio_path, "rb") as f:
+                response = request(
+                    "POST", stt_url, data=f.read(),
+                    headers={"Authorization": tts_headers["Authorization"], "Content-Type": "audio/mpeg"})
+            response.raise_for_status()
+            words = response.json()["results"]["channels"][0]["alternatives"][0]["words"]
+        except Exception as e:
+            logger.warning("Word timestamps unavailable for %s: %s", audio_path, e)
+            return None
+        timings = [(word["start"], word["end"]) for word in words]
+        caption_cache.put_text(key, json.dumps(timings))
+
+    if len(timings) != word_count:
+        logger.info("Transcript of %s has %d words, script has %d", audio_path, len(timings), word_count)
+        return None
+    return timings
+
+
+def group_phrases(words, timings, duration, max_words=CAPTION_MAX_WORDS):
+    """
+    Group timed words into phrase cues [start, end, text], breaking after
+    punctuation or every max_words words. Cues are made contiguous and cover
+    the whole scene, so a caption is always on screen.
+    """
+    phrases = []
+    current = []
+    for index, word in enumerate(words):
+        current.append(index)
+        if len(current) >= max_words or word[-1] in PAUSE_WEIGHTS or index == len(words) - 1:
+            phrases.append(current)
+            current = []
+
+    starts = [0.0] + [min(timings[phrase[0]][0], duration) for phrase in phrases[1:]] + [duration]
+    return [
+        [round(starts[i], 3), round(starts[i + 1], 3), " ".join(words[k] for k in phrase)]
+        for i, phrase in enumerate(phrases)
+    ]
+
+
+def scene_cues(text, audio_path, duration):
+    """
+    Caption cues for one scene as [start, end, text] lists, relative to the
+    start of the scene. Linear in the number of words.
+    """
+    words = text.split()
+    if not words or not duration:
+        return []
+    if CAPTION_MODE == "scene":
+        return [[0.0, round(duration, 3), " ".join(words)]]
+
+    timings = None
+    if CAPTION_TIMING == "deepgram":
+        timings = deepgram_word_timings(text, audio_path, len(words))
+    timings = timings or proportional_timings(words, duration)
+    return group_phrases(words, timings, duration)
@@ -0,0 +1,209 @@
+import os
+import time
+import atexit
+import asyncio
+import logging
+import threading
+from crawl4ai import AsyncWebCrawler
+
+logger = logging.getLogger(__name__)
+
+CRAWLER_POOL_SIZE = int(os.environ.get("SCROLLA_CRAWLER_POOL_SIZE", 2))
+CRAWLER_MAX_PAGES = int(os.environ.get("SCROLLA_CRAWLER_MAX_PAGES", 4))
+# Browsers are restarted after this many pages to bound memory growth
+CRAWLER_RECYCLE_AFTER = int(os.environ.get("SCROLLA_CRAWLER_RECYCLE_AFTER", 50))
+# Idle browsers are probed at most this often (seconds) before being handed out
+CRAWLER_HEALTHCHECK_INTERVAL = int(os.environ.get("SCROLLA_CRAWLER_HEALTHCHECK_INTERVAL", 60))
+
+HEALTHCHECK_URL = "raw:<html><body>ok</body></html>"
+
+
+class PooledCrawler:
+    def __init__(self, crawler):
+        self.crawler = crawler
+        self.pages = 0
+        self.active = 0
+        self.retiring = False
+        self.last_checked = time.monotonic()
+
+
+class CrawlerPool:
+    """
+    Process-wide pool of warm AsyncWebCrawler browsers. Each browser crawls up
+    to `max_pages` pages at once; a new browser is started only when every
+    running one is at that limit, up to `size` browsers.
+
+    Browsers are bound to the event loop that started them, while Flask and the
+    job workers each run their own short-lived loops, so the pool owns a
+    dedicated loop thread and `crawl()` forwards work to it from any loop.
+    Nothing is started until the first URL is crawled.
+    """
+
+    def __init__(self, size=CRAWLER_POOL_SIZE, max_pages=CRAWLER_MAX_PAGES,
+                 recycle_after=CRAWLER_RECYCLE_AFTER, healthcheck_interval=CRAWLER_HEALTHCHECK_INTERVAL):
+        self.size = max(1, size)
+        self.max_pages = max(1, max_pages)
+        self.recycle_after = recycle_after
+        self.healthcheck_interval = healthcheck_interval
+        self.pages_crawled = 0
+        self.browsers_started = 0
+        self.browsers_recycled = 0
+        self._loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self._available = None
+        self._browsers = []
+        self._starting = 0
+
+    def _ensure_loop(self):
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(
+                    target=self._loop.run_forever, name="scrolla-crawler-pool", daemon=True)
+                self._thread.start()
+            return self._loop
+
+    async def _start_browser(self):
+        crawler = AsyncWebCrawler()
+        await crawler.__aenter__()
+        self.browsers_started += 1
+        return PooledCrawler(crawler)
+
+    async def _close_browser(self, pooled):
+        try:
+            await pooled.crawler.__aexit__(None, None, None)
+        except Exception as e:
+            logger.warning("Error closing crawler: %s", e)
+
+    async def _is_healthy(self, pooled):
+        try:
+            result = await pooled.crawler.arun(url=HEALTHCHECK_URL)
+            return bool(getattr(result, "success", True))
+        except Exception as e:
+            logger.warning("Crawler health check failed: %s", e)
+            return False
+
+    def _assign(self, pooled):
+        """
+        Count a page against the browser when it is handed out, so a busy
+        browser takes no more than recycle_after pages in total
+        """
+        pooled.active += 1
+        pooled.pages += 1
+        if pooled.pages >= self.recycle_after:
+            pooled.retiring = True
+
+    async def _claim(self):
+        """
+        Take a page on the least busy browser with room for one, or reserve a
+        slot for a new browser (returns None), waiting while the pool is full
+        """
+        async with self._available:
+            while True:
+                open_browsers = [pooled for pooled in self._browsers
+                                 if not pooled.retiring and pooled.active < self.max_pages]
+                if open_browsers:
+                    pooled = min(open_browsers, key=lambda pooled: pooled.active)
+                    self._assign(pooled)
+                    return pooled
+                if len(self._browsers) + self._starting < self.size:
+                    self._starting += 1
+                    return None
+                await self._available.wait()
+
+    async def _checkout(self):
+        pooled = await self._claim()
+        if pooled is None:
+            try:
+                pooled = await self._start_browser()
+            finally:
+                async with self._available:
+                    self._starting -= 1
+                    if pooled is not None:
+                        self._assign(pooled)
+                        self._browsers.append(pooled)
+                    # A failed start frees the slot for whoever is waiting
+                    self._available.notify_all()
+            return pooled
+
+        if pooled.active == 1 and time.monotonic() - pooled.last_checked > self.healthcheck_interval:
+            pooled.last_checked = time.monotonic()
+            if not await self._is_healthy(pooled):
+                await self._checkin(pooled, healthy=False)
+                return await self._checkout()
+        return pooled
+
+    async def _checkin(self, pooled, healthy=True):
+        """
+        Release a page; unhealthy browsers and browsers past recycle_after take
+        no new pages and are closed once their last page finishes, which frees
+        their slot for a fresh browser
+        """
+        async with self._available:
+            pooled.active -= 1
+            if not healthy:
+                pooled.retiring = True
+            close = pooled.retiring and pooled.active == 0 and pooled in self._browsers
+            if close:
+                self._browsers.remove(pooled)
+                self.browsers_recycled += 1
+            self._available.notify_all()
+        if close:
+            await self._close_browser(pooled)
+
+    async def _crawl(self, url):
+        if self._available is None:
+            self._available = asyncio.Condition()
+
+        pooled = await self._checkout()
+        healthy = True
+        try:
+            result = await pooled.crawler.arun(url=url)
+            self.pages_crawled += 1
+            return result
+        except Exception:
+            healthy = False
+            raise
+        finally:
+            await self._checkin(pooled, healthy)
+
+    async def crawl(self, url):
+        """
+        Crawl `url` with a pooled browser; safe to await from any event loop
+        """
+        future = asyncio.run_coroutine_threadsafe(self._crawl(url), self._ensure_loop())
+        return await asyncio.wrap_future(future)
+
+    async def _close_all(self):
+        browsers, self._browsers = self._browsers, []
+        for pooled in browsers:
+            await self._close_browser(pooled)
+
+    def shutdown(self):
+        """
+        Close every browser and stop the pool's loop thread
+        """
+        with self._lock:
+            loop, self._loop = self._loop, None
+        if loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self._close_all(), loop).result(timeout=30)
+        loop.call_soon_threadsafe(loop.stop)
+        self._available = None
+
+    def stats(self):
+        browsers = list(self._browsers)
+        return {
+            "browsers": len(browsers),
+            "idle": sum(1 for pooled in browsers if pooled.active == 0),
+            "active_pages": sum(pooled.active for pooled in browsers),
+            "max_pages_per_browser": self.max_pages,
+            "pages_crawled": self.pages_crawled,
+            "browsers_started": self.browsers_started,
+            "browsers_recycled": self.browsers_recycled,
+        }
+
+
+crawler_pool = CrawlerPool()
+atexit.register(crawler_pool.shutdown)
@@ -0,0 +1,248 @@
+import os
+import time
+import logging
+import threading
+import contextvars
+import subprocess
+from functools import lru_cache
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# "auto" picks the first hardware H.264 encoder that works on this host and
+# falls back to libx264; any ffmpeg encoder name forces that encoder.
+ENCODER = os.environ.get("SCROLLA_ENCODER", "auto")
+HARDWARE_ENCODERS = ["h264_nvenc", "h264_qsv", "h264_videotoolbox"]
+
+
+def available_cpus():
+    """
+    Cores this process may run on (honours cgroup/affinity limits where the
+    platform exposes them)
+    """
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+CPU_COUNT = available_cpus()
+# Encoder threads per ffmpeg process, and how many encodes may run at once
+# across every job in the process. The defaults cover each core once.
+ENCODE_THREADS = int(os.environ.get("SCROLLA_X264_THREADS", min(4, CPU_COUNT)))
+RENDER_WORKERS = int(os.environ.get(
+    "SCROLLA_RENDER_WORKERS", max(1, CPU_COUNT // max(1, ENCODE_THREADS))))
+ENCODER_BENCHMARK = os.environ.get("SCROLLA_ENCODER_BENCHMARK", "1") == "1"
+BENCHMARK_FRAMES = 60
+
+# Held for the duration of every ffmpeg encode, so concurrent jobs share the
+# RENDER_WORKERS slots instead of each starting their own full set
+render_slots = threading.BoundedSemaphore(max(1, RENDER_WORKERS))
+_encode_clock = contextvars.ContextVar("scrolla_encode_clock", default=None)
+
+_benchmark = {}
+_benchmark_lock = threading.Lock()
+
+
+class EncodeClock:
+    """
+    Wall time during which at least one of a render's encodes held a render slot
+    """
+
+    def __init__(self):
+        self.seconds = 0.0
+        self._active = 0
+        self._since = None
+        self._lock = threading.Lock()
+
+    def begin(self):
+        with self._lock:
+            if self._active == 0:
+                self._since = time.perf_counter()
+            self._active += 1
+
+    def end(self):
+        with self._lock:
+            self._active -= 1
+            if self._active == 0:
+                self.seconds += time.perf_counter() - self._since
+
+
+@contextmanager
+def timed_encodes():
+    """
+    Time the encode_slot() sections run in this context (and copies of it)
+    """
+    clock = EncodeClock()
+    token = _encode_clock.set(clock)
+    try:
+        yield clock
+    finally:
+        _encode_clock.reset(token)
+
+
+@contextmanager
+def encode_slot():
+    """
+    Hold a render slot, counting the time it is held on the current EncodeClock
+    """
+    with render_slots:
+        clock = _encode_clock.get()
+        if clock:
+            clock.begin()
+        try:
+            yield
+        finally:
+            if clock:
+                clock.end()
+
+
+@lru_cache(maxsize=None)
+def available_encoders():
+    """
+    Names of the video encoders this ffmpeg build lists (empty without ffmpeg)
+    """
+    try:
+        result = subprocess.run(
+            ["ffmpeg", "-hide_banner", "-encoders"], stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            text=True, timeout=30)
+    except (OSError, subprocess.TimeoutExpired):
+        return frozenset()
+    names = set()
+    for line in result.stdout.splitlines():
+        parts = line.split()
+        if len(parts) >= 2 and parts[0].startswith("V"):
+            names.add(parts[1])
+    return frozenset(names)
+
+
+def probe_encoder(encoder):
+    """
+    True if a tiny test encode succeeds (a listed hardware encoder can still
+    fail at runtime when no device or driver is present)
+    """
+    command = [
+        "ffmpeg", "-hide_banner", "-loglevel", "error",
+        "-f", "lavfi", "-i", "color=black:s=256x256:d=0.2",
+        "-c:v", encoder, "-f", "null", "-",
+    ]
+    try:
+        return subprocess.run(
+            command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=30).returncode == 0
+    except (OSError, subprocess.TimeoutExpired):
+        return False
+
+
+@lru_cache(maxsize=None)
+def select_encoder():
+    """
+    The H.264 encoder every render uses, resolved once per process
+    """
+    if ENCODER != "auto":
+        return ENCODER
+    listed = available_encoders()
+    for encoder in HARDWARE_ENCODERS:
+        if encoder in listed and probe_encoder(encoder):
+            logger.info("Using hardware encoder %s", encoder)
+            return encoder
+    return "libx264"
+
+
+def split_threads(weights, threads=ENCODE_THREADS):
+    """
+    Share one render slot's encoder threads between the outputs of one ffmpeg
+    process, in proportion to their weights (at least one thread each)
+    """
+    total = sum(weights)
+    return [max(1, int(threads * weight / total)) for weight in weights]
+
+
+def encoder_args(profile, still_image=True, encoder=None, threads=None):
+    """
+    Video codec arguments for a render profile on the selected encoder. The
+    profile's x264 preset/CRF are mapped onto the closest hardware settings.
+    """
+    encoder = encoder or select_encoder()
+    fast = profile["preset"] in ("ultrafast", "superfast", "veryfast", "faster", "fast")
+    quality = str(profile["crf"])
+
+    if encoder == "libx264":
+        args = ["-c:v", "libx264", "-preset", profile["preset"], "-crf", quality,
+                "-threads", str(threads or ENCODE_THREADS)]
+        if still_image:
+            args += ["-tune", "stillimage"]
+    elif encoder == "h264_nvenc":
+        args = ["-c:v", "h264_nvenc", "-preset", "p2" if fast else "p6",
+                "-rc", "vbr", "-cq", quality, "-b:v", "0"]
+    elif encoder == "h264_qsv":
+        args = ["-c:v", "h264_qsv", "-preset", "veryfast" if fast else "slow", "-global_quality", quality]
+    elif encoder == "h264_videotoolbox":
+        # -q:v runs 1-100 (higher is better); CRF 18-30 maps to roughly 75-45
+        args = ["-c:v", "h264_videotoolbox", "-q:v", str(max(1, min(100, int(120 - int(quality) * 2.5))))]
+    else:
+        args = ["-c:v", encoder]
+    return args + ["-pix_fmt", "yuv420p", "-r", str(profile["fps"])]
+
+
+def benchmark_encoder(profile, width, height, frames=BENCHMARK_FRAMES):
+    """
+    Encode `frames` frames of a synthetic still at the output size with the
+    selected encoder → achievable frames per second, or None on failure
+    """
+    command = [
+        "ffmpeg", "-hide_banner", "-loglevel", "error", "-y",
+        "-f", "lavfi", "-i", f"testsrc2=s={width}x{height}:r={profile['fps']}",
+        # One frame repeated, as the renderer feeds the encoder
+        "-vf", f"trim=end_frame=1,loop=loop={frames - 1}:size=1,setpts=N/({profile['fps']}*TB)",
+        "-frames:v", str(frames),
+        *encoder_args(profile),
+        "-f", "null", "-",
+    ]
+    with render_slots:
+        started = time.perf_counter()
+        try:
+            result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=300)
+        except (OSError, subprocess.TimeoutExpired) as e:
+            logger.warning("Encoder benchmark failed: %s", e)
+            return None
+        elapsed = time.perf_counter() - started
+    if result.returncode != 0:
+        logger.warning("Encoder benchmark failed: %s", result.stderr.decode(errors='replace')[-300:])
+        return None
+    return round(frames / elapsed, 1)
+
+
+def run_self_benchmark(profiles, width, height):
+    """
+    Record the achievable encode fps for each render profile on this host
+    """
+    for name, profile in profiles.items():
+        fps = benchmark_encoder(dict(profile, name=name), width, height)
+        with _benchmark_lock:
+            _benchmark[name] = fps
+        logger.info("Encoder benchmark: %s '%s' encodes %s fps at %dx%d", select_encoder(), name, fps, width, height)
+
+
+def start_self_benchmark(profiles, width, height):
+    """
+    Run the startup benchmark on a daemon thread so it never delays serving
+    """
+    if not ENCODER_BENCHMARK:
+        return None
+    thread = threading.Thread(
+        target=run_self_benchmark, args=(profiles, width, height), name="encoder-benchmark", daemon=True)
+    thread.start()
+    return thread
+
+
+def encoder_stats():
+    with _benchmark_lock:
+        benchmark = dict(_benchmark)
+    return {
+        "encoder": select_encoder(),
+        "hardware_encoders": sorted(set(HARDWARE_ENCODERS) & available_encoders()),
+        "cpu_count": CPU_COUNT,
+        "encode_threads": ENCODE_THREADS,
+        "render_workers": RENDER_WORKERS,
+        "benchmark_fps": benchmark,
+    }
@@ -0,0 +1,258 @@
+import os
+import time
+import random
+import logging
+import mimetypes
+import threading
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+from . import telemetry
+
+logger = logging.getLogger(__name__)
+
+HTTP_CONNECT_TIMEOUT = float(os.environ.get("SCROLLA_HTTP_CONNECT_TIMEOUT", 5))
+HTTP_READ_TIMEOUT = float(os.environ.get("SCROLLA_HTTP_READ_TIMEOUT", 120))
+HTTP_MAX_RETRIES = int(os.environ.get("SCROLLA_HTTP_MAX_RETRIES", 4))
+HTTP_BACKOFF_BASE = float(os.environ.get("SCROLLA_HTTP_BACKOFF_BASE", 0.5))
+HTTP_BACKOFF_MAX = float(os.environ.get("SCROLLA_HTTP_BACKOFF_MAX", 30))
+# Max requests in flight per host across the whole process
+HTTP_PER_HOST_LIMIT = int(os.environ.get("SCROLLA_HTTP_PER_HOST_LIMIT", 8))
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+_session = None
+_session_lock = threading.Lock()
+_host_slots = {}
+
+
+def get_session():
+    """
+    Process-wide keep-alive session shared by every provider
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=16, pool_maxsize=max(16, HTTP_PER_HOST_LIMIT * 2))
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+        return _session
+
+
+def host_slots(url):
+    host = urlparse(url).netloc
+    with _session_lock:
+        if host not in _host_slots:
+            _host_slots[host] = threading.BoundedSemaphore(max(1, HTTP_PER_HOST_LIMIT))
+        return _host_slots[host]
+
+
+class DownloadError(Exception):
+    """Raised when a download is rejected or cannot be completed"""
+
+
+def count(name, amount=1):
+    telemetry.count(f"http_{name}", amount)
+
+
+def release_on_close(response, slots):
+    """
+    Keep the host slot of a streamed response until its body is closed
+    """
+    close = response.close
+    released = False
+
+    def close_and_release():
+        nonlocal released
+        try:
+            close()
+        finally:
+            if not released:
+                released = True
+                slots.release()
+
+    response.close = close_and_release
+    return response
+
+
+def parse_retry_after(value):
+    """
+    Seconds to wait from a Retry-After header (delta-seconds or HTTP-date)
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt, retry_after=None):
+    """
+    Full-jitter exponential backoff, or the server's Retry-After when given
+    """
+    if retry_after is not None:
+        return min(retry_after, HTTP_BACKOFF_MAX)
+    return random.uniform(0, min(HTTP_BACKOFF_MAX, HTTP_BACKOFF_BASE * (2 ** attempt)))
+
+
+def request(method, url, max_retries=HTTP_MAX_RETRIES, timeout=None, **kwargs):
+    """
+    Send a request through the pooled session, retrying 429/5xx responses and
+    connection errors with backoff. Returns the last response.
+    """
+    session = get_session()
+    slots = host_slots(url)
+    timeout = timeout or (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+
+    attempt = 0
+    while True:
+        count("requests")
+        try:
+            slots.acquire()
+            try:
+                response = session.request(method, url, timeout=timeout, **kwargs)
+            except BaseException:
+                slots.release()
+                raise
+            if kwargs.get("stream"):
+                release_on_close(response, slots)
+            else:
+                slots.release()
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            if attempt >= max_retries:
+                count("failures")
+                raise
+            delay = backoff_delay(attempt)
+            logger.warning("%s %s failed (%s), retrying in %.1fs", method, url, e, delay)
+        else:
+            if response.status_code not in RETRY_STATUSES or attempt >= max_retries:
+                if response.status_code >= 400:
+                    count("failures")
+                return response
+            delay = backoff_delay(attempt, parse_retry_after(response.headers.get("Retry-After")))
+            logger.warning("%s %s returned %s, retrying in %.1fs", method, url, response.status_code, delay)
+            response.close()
+
+        count("retries")
+        attempt += 1
+        time.sleep(delay)
+
+
+def range_total(response):
+    """
+    Full size from a Content-Range header ("bytes 0-99/1234", "bytes */1234")
+    """
+    content_range = response.headers.get("Content-Range")
+    if not content_range or "/" not in content_range:
+        return None
+    total = content_range.rsplit("/", 1)[1]
+    return int(total) if total.isdigit() else None
+
+
+def expected_length(response, offset):
+    """
+    Total size the finished file should have, if the server told us
+    """
+    if response.headers.get("Content-Encoding", "identity") != "identity":
+        return None  # iter_content yields decoded bytes, so lengths won't match
+    if response.status_code == 206 and response.headers.get("Content-Range"):
+        return range_total(response)
+    content_length = response.headers.get("Content-Length")
+    if content_length and content_length.isdigit():
+        return int(content_length) + (offset if response.status_code == 206 else 0)
+    return None
+
+
+def download_to_file(method, url, dest_path, expected_types=None, add_extension=False,
+                     max_retries=HTTP_MAX_RETRIES, **kwargs):
+    """
+    Stream a response body to `<dest_path>.part` and rename it into place once
+    it checks out; interrupted GETs resume with a Range request.
+    Returns (final_path, content_type).
+    """
+    part_path = f"{dest_path}.part"
+    os.makedirs(os.path.dirname(dest_path) or ".", exist_ok=True)
+    resumable = method.upper() == "GET"
+    content_type = None
+
+    attempt = 0
+    while True:
+        offset = os.path.getsize(part_path) if resumable and os.path.exists(part_path) else 0
+        headers = dict(kwargs.pop("headers", None) or {})
+        if offset:
+            headers["Range"] = f"bytes={offset}-"
+        kwargs["headers"] = headers
+
+        try:
+            # request() already retries connection errors, timeouts and 429/5xx
+            response = request(method, url, max_retries=max_retries, stream=True, **kwargs)
+        except requests.exceptions.RequestException:
+            if os.path.exists(part_path):
+                os.remove(part_path)
+            raise
+
+        try:
+            with response:
+                if response.status_code == 416 and offset:
+                    # The last attempt got every byte but broke before finishing
+                    if content_type is not None and range_total(response) == offset:
+                        break
+                    os.remove(part_path)
+                    continue
+                if response.status_code not in (200, 206):
+                    raise DownloadError(f"{method} {url} returned {response.status_code}: {response.text[:200]}")
+                if response.status_code == 200:
+                    offset = 0
+
+                content_type = (response.headers.get("Content-Type") or "").split(";")[0].strip()
+                if expected_types and not content_type.startswith(tuple(expected_types)):
+                    raise DownloadError(f"{method} {url} returned unexpected Content-Type '{content_type}'")
+
+                total = expected_length(response, offset)
+                written = offset
+                try:
+                    with open(part_path, "ab" if offset else "wb") as f:
+                        for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                            f.write(chunk)
+                            written += len(chunk)
+                finally:
+                    count("bytes_downloaded", written - offset)
+
+                if total is not None and written != total:
+                    raise requests.exceptions.ChunkedEncodingError(
+                        f"Incomplete download: got {written} of {total} bytes")
+
+        except DownloadError:
+            if os.path.exists(part_path):
+                os.remove(part_path)
+            count("failures")
+            raise
+        except requests.exceptions.RequestException as e:
+            # The body broke off mid-stream: only GETs are resumed, never resent POSTs
+            if not resumable or attempt >= max_retries:
+                if os.path.exists(part_path):
+                    os.remove(part_path)
+                count("failures")
+                raise
+            delay = backoff_delay(attempt)
+            logger.warning("Download of %s interrupted (%s), retrying in %.1fs", url, e, delay)
+            count("retries")
+            attempt += 1
+            time.sleep(delay)
+            continue
+        break
+
+    final_path = dest_path
+    if add_extension:
+        final_path += mimetypes.guess_extension(content_type) or ""
+    os.replace(part_path, final_path)
+    return final_path, content_type
@@ -1,40 +1,26 @@
 import os
-import time
-import mimetypes
+import logging
 import requests
+from .http_client import download_to_file, DownloadError
 
+logger = logging.getLogger(__name__)
 
-def download_image(url, filename, max_retries=3, retry_delay=1):
-    retries = 0
-    while retries < max_retries:
-        try:
-            response = requests.get(url)
-            print(f'{retries} try')
-            if response.status_code == 200:
+# Max number of image downloads in flight for a single job
+DOWNLOAD_CONCURRENCY = int(os.environ.get("SCROLLA_DOWNLOAD_CONCURRENCY", 8))
 
-                # content = response.content
-                content_type = response.headers.get('Content-Type')
-                extension = mimetypes.guess_extension(content_type)
-                filename_with_extension = f"{filename}{extension}"
-                
-                os.makedirs('images', exist_ok=True)
 
-                with open(os.path.join('images', filename_with_extension), 'wb') as file:
-                    file.write(response.content)
+def download_image(url, filename, ctx, max_retries=3):
+    """
+    Stream an image into the job's images dir; the extension comes from the
+    response Content-Type. Returns the saved path, or None on failure.
+    """
+    try:
+        image_path, _ = download_to_file(
+            "GET", url, os.path.join(ctx.images_dir, filename),
+            expected_types=("image/",), add_extension=True, max_retries=max_retries)
+    except (requests.exceptions.RequestException, DownloadError) as e:
+        logger.error("Error occurred while downloading image: %s", e)
+        return None
 
-                print(
-                    f"Image '{filename_with_extension}' downloaded successfully.")
-                return
-
-            else:
-                print(f"Failed to download image. Status code: {response.status_code}")
-                retries += 1
-                time.sleep(retry_delay)
-
-        except requests.exceptions.RequestException as e:
-            print(f"Error occurred while downloading image: {e}")
-            retries += 1
-            time.sleep(retry_delay)
-
-    print(f"Failed to download image after {max_retries} retries.")
-    
\ No newline at end of file
+    logger.debug("Image '%s' downloaded successfully.", os.path.basename(image_path))
+    return image_path
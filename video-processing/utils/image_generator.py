@@ -1,29 +1,83 @@
 import os
 import json
-import requests
+import base64
+import logging
+from .http_client import request
+
+logger = logging.getLogger(__name__)
 
 url = "https://api.openai.com/v1/images/generations"
 
+IMAGE_MODEL = "dall-e-3"
+IMAGE_SIZE = "1024x1792"
+# "b64_json" returns the image inside the generation response (no second
+# download, no expiring URL); "url" returns a hosted URL to download afterwards.
+IMAGE_RESPONSE_FORMAT = os.environ.get("SCROLLA_IMAGE_RESPONSE_FORMAT", "b64_json")
+
 headers = {
     'Content-Type': 'application/json',
     'Authorization': f'Bearer {os.environ.get("OPENAI_API_KEY")}'
 }
 
+# Max number of DALL-E requests in flight for a single job
+IMAGE_CONCURRENCY = int(os.environ.get("SCROLLA_IMAGE_CONCURRENCY", 4))
+
+IMAGE_SIGNATURES = [
+    (b"\x89PNG\r\n\x1a\n", ".png"),
+    (b"\xff\xd8\xff", ".jpg"),
+    (b"RIFF", ".webp"),
+]
+
+
+def request_image(prompt, response_format):
+    payload = json.dumps({
+        "model": IMAGE_MODEL,
+        "prompt": prompt,
+        "n": 1,
+        "size": IMAGE_SIZE,
+        "response_format": response_format
+    })
+
+    response = request("POST", url, headers=headers, data=payload)
+    if response.status_code != 200:
+        logger.error("Error generating image: %s %s", response.status_code, response.text)
+        return None
+
+    return response.json().get('data')[0][response_format]
+
 
 def generate_image(prompt: str) -> str:
     if not prompt:
         return None
     try:
-        payload = json.dumps({
-            "model": "dall-e-3",
-            "prompt": prompt,
-            "n": 1,
-            "size": "1024x1792"
-        })
+        return request_image(prompt, "url")
+    except Exception as e:
+        logger.error("Error generating image: %s", e)
+        return None
+
+
+def generate_image_file(prompt: str, dest_path: str) -> str:
+    """
+    Generate an image as base64 and decode it straight to dest_path (the
+    extension is added from the image signature). Returns the saved path.
+    """
+    if not prompt:
+        return None
+    try:
+        encoded = request_image(prompt, "b64_json")
+        if not encoded:
+            return None
+        data = base64.b64decode(encoded)
 
-        response = requests.request("POST", url, headers=headers, data=payload)
+        extension = next((ext for signature, ext in IMAGE_SIGNATURES if data.startswith(signature)), ".png")
+        image_path = f"{dest_path}{extension}"
+        os.makedirs(os.path.dirname(image_path) or ".", exist_ok=True)
 
-        return response.json().get('data')[0]['url']
+        tmp_path = f"{image_path}.part"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, image_path)
+        return image_path
     except Exception as e:
-        print(f"Error generating image: {e}")
+        logger.error("Error generating image: %s", e)
         return None
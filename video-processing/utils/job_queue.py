@@ -0,0 +1,241 @@
+import os
+import json
+import time
+import uuid
+import queue
+import sqlite3
+import asyncio
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKERS = int(os.environ.get("SCROLLA_JOB_WORKERS", 2))
+JOB_QUEUE_DEPTH = int(os.environ.get("SCROLLA_JOB_QUEUE_DEPTH", 16))
+# Optional SQLite file for job records; jobs are only kept in memory without it
+JOB_DB_PATH = os.environ.get("SCROLLA_JOB_DB")
+# Finished and failed jobs are forgotten after this many seconds, and beyond
+# this many the oldest ones go first
+JOB_RETENTION = int(os.environ.get("SCROLLA_JOB_RETENTION", 24 * 3600))
+JOB_HISTORY = int(os.environ.get("SCROLLA_JOB_HISTORY", 1000))
+FINISHED_STATUSES = ("done", "failed")
+
+
+class QueueFull(Exception):
+    """Raised when a submission would exceed the queue depth"""
+
+
+class JobBusy(Exception):
+    """Raised when resubmitting a job that is still queued or running"""
+
+
+class JobQueue:
+    """
+    Local job queue: submissions are stored and handed to a fixed pool of worker
+    threads, each running `runner(job_id, payload, progress)` on its own event
+    loop. `progress(stage)` records per-stage timing on the job.
+    """
+
+    def __init__(self, runner, workers=JOB_WORKERS, max_queue=JOB_QUEUE_DEPTH, db_path=JOB_DB_PATH,
+                 retention=JOB_RETENTION, history=JOB_HISTORY):
+        self.runner = runner
+        self.workers = max(1, workers)
+        self.max_queue = max(1, max_queue)
+        self.db_path = db_path
+        self.retention = retention
+        self.history = history
+        self._queue = queue.Queue()
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def _init_db(self):
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs (id TEXT PRIMARY KEY, record TEXT NOT NULL)")
+            rows = conn.execute("SELECT record FROM jobs").fetchall()
+
+        for (record,) in rows:
+            job = json.loads(record)
+            if job["status"] == "running":
+                job["status"] = "failed"
+                job["error"] = "Interrupted by server restart"
+            self._jobs[job["id"]] = job
+            if job["status"] == "queued":
+                self._queue.put(job["id"])
+        self._forget(self._prune(time.time()))
+        for job in self._jobs.values():
+            self._persist(job)
+
+    def _persist(self, job):
+        if not self.db_path:
+            return
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO jobs (id, record) VALUES (?, ?)",
+                (job["id"], json.dumps(job)))
+
+    def _forget(self, job_ids):
+        if not self.db_path or not job_ids:
+            return
+        with self._connect() as conn:
+            conn.executemany("DELETE FROM jobs WHERE id = ?", [(job_id,) for job_id in job_ids])
+
+    def _expired(self, now):
+        """
+        Ids of finished jobs past the retention time or beyond the history limit
+        """
+        finished = sorted(
+            (job for job in self._jobs.values() if job["status"] in FINISHED_STATUSES),
+            key=lambda job: job["updated_at"])
+        overflow = max(0, len(finished) - self.history)
+        return [job["id"] for n, job in enumerate(finished)
+                if n < overflow or now - job["updated_at"] > self.retention]
+
+    def _prune(self, now):
+        """
+        Drop expired finished jobs; called with the lock held. Returns their ids.
+        """
+        expired = self._expired(now)
+        for job_id in expired:
+            del self._jobs[job_id]
+        return expired
+
+    def _update(self, job_id, **fields):
+        with self._lock:
+            job = self._jobs[job_id]
+            job.update(fields)
+            job["updated_at"] = time.time()
+            snapshot = json.loads(json.dumps(job))
+        self._persist(snapshot)
+        return snapshot
+
+    def start(self):
+        """
+        Restore persisted jobs (re-queueing the ones still queued) and start the
+        workers. Nothing touches the database or spawns threads before this.
+        """
+        with self._lock:
+            if self._threads:
+                return
+            if self.db_path:
+                self._init_db()
+            for i in range(self.workers):
+                thread = threading.Thread(
+                    target=self._worker, name=f"scrolla-job-worker-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def pending(self):
+        with self._lock:
+            return sum(1 for job in self._jobs.values() if job["status"] == "queued")
+
+    def _new_job(self, job_id, payload, now, created_at=None):
+        return {
+            "id": job_id,
+            "status": "queued",
+            "stage": None,
+            "stages": [],
+            "payload": payload,
+            "result": None,
+            "error": None,
+            "created_at": created_at or now,
+            "updated_at": now,
+        }
+
+    def _check_room(self, count):
+        queued = sum(1 for job in self._jobs.values() if job["status"] == "queued")
+        if queued + count > self.max_queue:
+            raise QueueFull(f"Job queue is full ({queued}/{self.max_queue} queued)")
+
+    def submit_many(self, payloads):
+        """
+        Queue every payload or none of them. Raises QueueFull when the queue does
+        not have room for all of them.
+        """
+        self.start()
+        now = time.time()
+        with self._lock:
+            self._check_room(len(payloads))
+            expired = self._prune(now)
+            jobs = []
+            for payload in payloads:
+                job = self._new_job(uuid.uuid4().hex, payload, now)
+                self._jobs[job["id"]] = job
+                jobs.append(job)
+
+        self._forget(expired)
+        for job in jobs:
+            self._persist(job)
+            self._queue.put(job["id"])
+        return [job["id"] for job in jobs]
+
+    def resubmit(self, job_id, payload):
+        """
+        Queue `payload` under an existing job id, replacing the job's status,
+        stages and result once it runs (a job id with no record, e.g. one
+        rendered from the CLI, gets a new record). Raises JobBusy if the job is
+        still queued or running and QueueFull if there is no room.
+        """
+        self.start()
+        now = time.time()
+        with self._lock:
+            previous = self._jobs.get(job_id)
+            if previous is not None and previous["status"] in ("queued", "running"):
+                raise JobBusy(f"Job {job_id} is still {previous['status']}")
+            self._check_room(1)
+            expired = self._prune(now)
+            job = self._new_job(job_id, payload, now, previous and previous["created_at"])
+            self._jobs[job_id] = job
+
+        self._forget([job_id for job_id in expired if job_id != job["id"]])
+        self._persist(job)
+        self._queue.put(job_id)
+        return job_id
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return json.loads(json.dumps(job)) if job else None
+
+    def _advance(self, job_id, stage=None):
+        """
+        Close the job's current stage and, if given, open `stage`
+        """
+        now = time.time()
+        with self._lock:
+            stages = self._jobs[job_id]["stages"]
+            if stages and stages[-1]["finished_at"] is None:
+                stages[-1]["finished_at"] = now
+                stages[-1]["duration"] = round(now - stages[-1]["started_at"], 3)
+            if stage:
+                stages.append({"stage": stage, "started_at": now, "finished_at": None, "duration": None})
+        if stage:
+            self._update(job_id, stage=stage)
+
+    def _progress(self, job_id):
+        return lambda stage: self._advance(job_id, stage)
+
+    def _worker(self):
+        while True:
+            job_id = self._queue.get()
+            job = self.get(job_id)
+            if job is None or job["status"] != "queued":
+                self._queue.task_done()
+                continue
+
+            self._update(job_id, status="running", started_at=time.time())
+            progress = self._progress(job_id)
+            try:
+                result = asyncio.run(self.runner(job_id, job["payload"], progress))
+                self._advance(job_id)
+                self._update(job_id, status="done", stage="done", result=result)
+            except Exception as e:
+                logger.error("Job %s failed: %s", job_id, e)
+                self._advance(job_id)
+                self._update(job_id, status="failed", error=str(e))
+            finally:
+                self._queue.task_done()
@@ -0,0 +1,36 @@
+import os
+import json
+
+
+def write_scene_manifest(ctx, scenes):
+    """
+    Persist the job's scene list (text, audio path, duration and timeline
+    position per scene) so later stages never have to re-measure audio.
+    """
+    tmp_path = f"{ctx.manifest_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"job_id": ctx.job_id, "scenes": scenes}, f, indent=2)
+    os.replace(tmp_path, ctx.manifest_path)
+
+
+def update_scene_manifest(ctx, updates):
+    """
+    Merge {scene_number: {field: value}} into the job's manifest entries (e.g.
+    the content keys of a scene's inputs and rendered segment)
+    """
+    scenes = read_scene_manifest(ctx)
+    for scene_number, fields in updates.items():
+        if scene_number in scenes:
+            scenes[scene_number].update(fields)
+    write_scene_manifest(ctx, [scenes[number] for number in sorted(scenes)])
+
+
+def read_scene_manifest(ctx):
+    """
+    Scenes from the job's manifest keyed by scene number ({} if none yet)
+    """
+    if not os.path.exists(ctx.manifest_path):
+        return {}
+    with open(ctx.manifest_path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    return {scene["scene_number"]: scene for scene in manifest.get("scenes", [])}
@@ -0,0 +1,127 @@
+import os
+import time
+import threading
+import multiprocessing
+from dataclasses import dataclass, field
+from concurrent.futures import ProcessPoolExecutor
+import fitz
+
+PDF_WORKERS = int(os.environ.get("SCROLLA_PDF_WORKERS", min(4, os.cpu_count() or 1)))
+PDF_PAGES_PER_TASK = int(os.environ.get("SCROLLA_PDF_PAGES_PER_TASK", 8))
+# Extraction stops once either budget is reached; a short never needs a whole report
+PDF_MAX_PAGES = int(os.environ.get("SCROLLA_PDF_MAX_PAGES", 200))
+PDF_MAX_CHARS = int(os.environ.get("SCROLLA_PDF_MAX_CHARS", 200_000))
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+@dataclass
+class PdfExtraction:
+    text: str
+    page_count: int
+    pages_read: int
+    truncated: bool
+    seconds: float
+    # (page_number, seconds, chars) for every page that was read
+    page_timings: list = field(default_factory=list)
+
+    def summary(self):
+        return {
+            "page_count": self.page_count,
+            "pages_read": self.pages_read,
+            "truncated": self.truncated,
+            "chars": len(self.text),
+            "seconds": round(self.seconds, 3),
+            "page_timings": [
+                {"page": page, "seconds": round(seconds, 4), "chars": chars}
+                for page, seconds, chars in self.page_timings
+            ],
+        }
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # spawn: the server is multi-threaded, so forking it is not safe
+            _executor = ProcessPoolExecutor(
+                max_workers=max(1, PDF_WORKERS), mp_context=multiprocessing.get_context("spawn"))
+        return _executor
+
+
+def extract_page_range(pdf_path, start, stop):
+    """
+    Extract text (no images) from pages [start, stop) → [(page, text, seconds)]
+    """
+    pages = []
+    with fitz.open(pdf_path) as doc:
+        for page_num in range(start, min(stop, len(doc))):
+            started = time.perf_counter()
+            text = doc.load_page(page_num).get_text("text")
+            pages.append((page_num + 1, text, time.perf_counter() - started))
+    return pages
+
+
+def extract_pdf(pdf_path, max_pages=PDF_MAX_PAGES, max_chars=PDF_MAX_CHARS,
+                workers=PDF_WORKERS, pages_per_task=PDF_PAGES_PER_TASK):
+    """
+    Extract text from a PDF in page ranges spread over worker processes.
+
+    Ranges are submitted a few at a time and consumed in page order, so
+    extraction stops early (and pending ranges are cancelled) as soon as the
+    page or character budget is met. Text is joined once at the end.
+    """
+    started = time.perf_counter()
+    with fitz.open(pdf_path) as doc:
+        page_count = len(doc)
+
+    last_page = min(page_count, max_pages) if max_pages else page_count
+    ranges = [(start, min(start + pages_per_task, last_page))
+              for start in range(0, last_page, pages_per_task)]
+
+    parts = []
+    page_timings = []
+    chars = 0
+
+    def consume(pages):
+        nonlocal chars
+        for page_number, text, seconds in pages:
+            parts.append(text)
+            page_timings.append((page_number, seconds, len(text)))
+            chars += len(text)
+            if max_chars and chars >= max_chars:
+                return False
+        return True
+
+    if workers <= 1 or len(ranges) <= 1:
+        for start, stop in ranges:
+            if not consume(extract_page_range(pdf_path, start, stop)):
+                break
+    else:
+        executor = get_executor()
+        window = max(1, workers) * 2
+        pending = []
+        next_range = 0
+        while next_range < len(ranges) or pending:
+            while next_range < len(ranges) and len(pending) < window:
+                start, stop = ranges[next_range]
+                pending.append(executor.submit(extract_page_range, pdf_path, start, stop))
+                next_range += 1
+            if not consume(pending.pop(0).result()):
+                for future in pending:
+                    future.cancel()
+                break
+
+    text = "".join(parts)
+    if max_chars and len(text) > max_chars:
+        text = text[:max_chars]
+
+    return PdfExtraction(
+        text=text,
+        page_count=page_count,
+        pages_read=len(page_timings),
+        truncated=len(page_timings) < page_count or len(text) < chars,
+        seconds=time.perf_counter() - started,
+        page_timings=page_timings,
+    )
@@ -0,0 +1,271 @@
+import os
+import shutil
+import asyncio
+import logging
+from .cache import image_cache, cache_key
+from .manifest import read_scene_manifest, update_scene_manifest
+from .image_generator import (
+    generate_image, generate_image_file, IMAGE_CONCURRENCY, IMAGE_MODEL, IMAGE_SIZE, IMAGE_RESPONSE_FORMAT)
+from .image_downloader import download_image, DOWNLOAD_CONCURRENCY
+from .subtitles_generator import generate_audio_and_subtitle, synthesize_scene, clean_text, write_timeline
+from .captions import scene_cues
+from .tts import TTS_CONCURRENCY, VOICE_MODEL
+from .video_generator import (
+    create_video_with_audio_and_subtitles, create_video_from_scene_segments, render_scene_segment_cached,
+    concat_segments, cut_pass_segments, record_segments, remove_concat_list, render_profile, encode_report,
+    finish_render,
+    RENDER_MODE, RENDER_PROFILE, RENDER_WORKERS)
+from .encoder import timed_encodes
+from .telemetry import span
+
+logger = logging.getLogger(__name__)
+
+
+def scene_input_keys(item):
+    """
+    Content keys of what a script scene's assets are made from: its image
+    prompt (→ image) and its cleaned narration (→ audio and captions)
+    """
+    return {
+        "image_key": cache_key(item['image_prompt'], IMAGE_MODEL, IMAGE_SIZE),
+        "audio_key": cache_key(clean_text(item['text']), VOICE_MODEL),
+    }
+
+
+def record_scene_inputs(ctx, scenes):
+    update_scene_manifest(ctx, {item['scene_number']: scene_input_keys(item) for item in scenes})
+
+
+async def fetch_scene_image(item, ctx, generate_limit, download_limit):
+    """
+    Put one scene's image into the job's images dir (from the cache, a base64
+    generation, or generation + download). Returns the image path or None.
+    """
+    scene_number = item['scene_number']
+    key = scene_input_keys(item)["image_key"]
+    cached_path = image_cache.get_path(key)
+    if cached_path:
+        extension = os.path.splitext(cached_path)[1]
+        os.makedirs(ctx.images_dir, exist_ok=True)
+        image_path = ctx.image_path(scene_number, extension)
+        with span("image.cache", scene=scene_number):
+            shutil.copyfile(cached_path, image_path)
+        logger.info("Image for scene %s served from cache", scene_number)
+        return image_path
+
+    if IMAGE_RESPONSE_FORMAT == "b64_json":
+        async with generate_limit:
+            logger.info("Generating image for scene %s", scene_number)
+            with span("image.generate", scene=scene_number):
+                image_path = await asyncio.to_thread(
+                    generate_image_file, item['image_prompt'], ctx.image_path(scene_number, ""))
+        if image_path:
+            image_cache.put_file(key, image_path)
+        return image_path
+
+    async with generate_limit:
+        logger.info("Generating image for scene %s", scene_number)
+        with span("image.generate", scene=scene_number):
+            url = await asyncio.to_thread(generate_image, item['image_prompt'])
+    if not url:
+        logger.warning("No image generated for scene %s", scene_number)
+        return None
+    async with download_limit:
+        logger.info("Downloading image for scene %s", scene_number)
+        with span("image.download", scene=scene_number):
+            image_path = await asyncio.to_thread(download_image, url, f"image{scene_number}", ctx)
+    if image_path:
+        image_cache.put_file(key, image_path)
+    return image_path
+
+
+async def generate_scene_assets(scenes, ctx):
+    """
+    Generate images, audio and subtitles for every scene, overlapping the
+    network-bound work across scenes
+    """
+    generate_limit = asyncio.Semaphore(max(1, IMAGE_CONCURRENCY))
+    download_limit = asyncio.Semaphore(max(1, DOWNLOAD_CONCURRENCY))
+
+    audio_task = asyncio.to_thread(
+        generate_audio_and_subtitle, scenes, ctx, TTS_CONCURRENCY)
+
+    await asyncio.gather(
+        audio_task, *(fetch_scene_image(item, ctx, generate_limit, download_limit) for item in scenes))
+
+
+async def render_scenes_streaming(scenes, ctx, profile=RENDER_PROFILE):
+    """
+    Encode each scene as soon as its image and audio are ready, then join the
+    segments. Returns the encode report.
+    """
+    profile = render_profile(profile)
+    generate_limit = asyncio.Semaphore(max(1, IMAGE_CONCURRENCY))
+    download_limit = asyncio.Semaphore(max(1, DOWNLOAD_CONCURRENCY))
+    tts_limit = asyncio.Semaphore(max(1, TTS_CONCURRENCY))
+    render_limit = asyncio.Semaphore(max(1, RENDER_WORKERS))
+
+    ordered = [(item['scene_number'], clean_text(item['text'])) for item in scenes]
+    timed = {}
+    segments = {}
+    rendered = {}
+    fades = {}
+    written_prefix = 0
+
+    def publish_prefix():
+        nonlocal written_prefix
+        prefix = 0
+        while prefix < len(ordered) and ordered[prefix][0] in timed:
+            prefix += 1
+        if prefix > written_prefix:
+            written_prefix = prefix
+            write_timeline(
+                ctx, [(number, text, *timed[number]) for number, text in ordered[:prefix]])
+
+    async def synthesize(scene_number, text):
+        async with tts_limit:
+            logger.info("Generating audio for scene %s", scene_number)
+            return await asyncio.to_thread(synthesize_scene, text, scene_number, ctx)
+
+    async def scene_task(index, item):
+        scene_number, text = ordered[index]
+        image_path, (duration, cues) = await asyncio.gather(
+            fetch_scene_image(item, ctx, generate_limit, download_limit),
+            synthesize(scene_number, text))
+
+        timed[scene_number] = (duration or 0, cues)
+        publish_prefix()
+        if not image_path or not duration:
+            logger.warning("Missing files for scene %s", scene_number)
+            return
+
+        scene = {
+            "scene_number": scene_number,
+            "image": image_path,
+            "audio": ctx.audio_path(scene_number),
+            "duration": duration,
+            "subtitle": text,
+            "cues": cues,
+        }
+        fades[scene_number] = (index == 0, index == len(scenes) - 1)
+        async with render_limit:
+            segments[scene_number] = await asyncio.to_thread(
+                render_scene_segment_cached, ctx, scene, profile, *fades[scene_number])
+            rendered[scene_number] = scene
+
+    try:
+        with timed_encodes() as clock:
+            await asyncio.gather(*(scene_task(index, item) for index, item in enumerate(scenes)))
+            publish_prefix()
+
+            numbers = [number for number, _ in ordered if number in segments]
+            if not numbers:
+                raise Exception("No renderable scenes found")
+            # Fades were guessed from script positions; when the first or last scene
+            # was skipped, the segments now at either end are encoded again with them
+            for position, number in enumerate(numbers):
+                edges = (position == 0, position == len(numbers) - 1)
+                if edges != fades[number]:
+                    segments[number] = await asyncio.to_thread(
+                        render_scene_segment_cached, ctx, rendered[number], profile, *edges)
+            segment_paths = [segments[number][0] for number in numbers]
+            await asyncio.to_thread(concat_segments, ctx, segment_paths, profile)
+        record_scene_inputs(ctx, scenes)
+        record_segments(ctx, [rendered[number] for number in numbers], segment_paths)
+        report = encode_report(
+            profile, ctx.output_video, [rendered[number] for number in numbers],
+            clock.seconds,
+            [rendered[number] for number in numbers if segments[number][1]])
+        return finish_render(ctx, [rendered[number] for number in numbers], report)
+    finally:
+        remove_concat_list(ctx)
+
+
+def rendered_report(report):
+    """
+    The renderers log failures and return None; turn that into an error so the
+    job is not reported as finished without a video
+    """
+    if report is None:
+        raise Exception("Video rendering failed")
+    return report
+
+
+async def build_video(scenes, ctx, progress=None, render_mode=RENDER_MODE, profile=RENDER_PROFILE):
+    """
+    Turn a script's scenes into ctx.output_video with the configured render mode
+    and profile. Returns the encode report (encode fps, output bitrate); raises
+    if the video could not be rendered.
+    """
+    progress = progress or (lambda stage: None)
+
+    if render_mode == "streaming":
+        progress('assets+render')
+        with span("assets+render", scenes=len(scenes)):
+            return await render_scenes_streaming(scenes, ctx, profile)
+
+    progress('assets')
+    with span("assets", scenes=len(scenes)):
+        await generate_scene_assets(scenes, ctx)
+    record_scene_inputs(ctx, scenes)
+
+    progress('render')
+    with span("render", mode=render_mode):
+        report = await asyncio.to_thread(create_video_with_audio_and_subtitles, ctx, render_mode, profile)
+    return rendered_report(report)
+
+
+def remove_scene_files(ctx, scene_number, audio=True):
+    paths = [ctx.find_image(scene_number)] + ([ctx.audio_path(scene_number)] if audio else [])
+    for path in paths:
+        if path and os.path.exists(path):
+            os.remove(path)
+
+
+async def rerender_scenes(scenes, ctx, progress=None, profile=RENDER_PROFILE):
+    """
+    Re-render a finished job from an edited script, regenerating and encoding
+    only the scenes that changed. Returns the encode report.
+    """
+    progress = progress or (lambda stage: None)
+    previous = read_scene_manifest(ctx)
+    generate_limit = asyncio.Semaphore(max(1, IMAGE_CONCURRENCY))
+    download_limit = asyncio.Semaphore(max(1, DOWNLOAD_CONCURRENCY))
+    tts_limit = asyncio.Semaphore(max(1, TTS_CONCURRENCY))
+
+    async def refresh(item):
+        scene_number = item['scene_number']
+        text = clean_text(item['text'])
+        keys = scene_input_keys(item)
+        entry = previous.get(scene_number, {})
+
+        if entry.get("image_key") != keys["image_key"] or not ctx.find_image(scene_number):
+            remove_scene_files(ctx, scene_number, audio=False)
+            await fetch_scene_image(item, ctx, generate_limit, download_limit)
+
+        if (entry.get("audio_key") == keys["audio_key"] and entry.get("duration")
+                and os.path.exists(ctx.audio_path(scene_number))):
+            cues = entry.get("cues")
+            if cues is None:
+                # Manifests written before cues were stored: time them from the kept audio
+                cues = await asyncio.to_thread(scene_cues, text, ctx.audio_path(scene_number), entry["duration"])
+            return entry["duration"], cues
+        async with tts_limit:
+            logger.info("Generating audio for scene %s", scene_number)
+            return await asyncio.to_thread(synthesize_scene, text, scene_number, ctx)
+
+    progress('assets')
+    with span("assets", scenes=len(scenes)):
+        timings = await asyncio.gather(*(refresh(item) for item in scenes))
+
+    for scene_number in set(previous) - {item['scene_number'] for item in scenes}:
+        remove_scene_files(ctx, scene_number)
+    write_timeline(ctx, [(item['scene_number'], clean_text(item['text']), duration, cues)
+                         for item, (duration, cues) in zip(scenes, timings)])
+    record_scene_inputs(ctx, scenes)
+
+    progress('render')
+    with span("render", mode="segments"):
+        await asyncio.to_thread(cut_pass_segments, ctx, previous, render_profile(profile))
+        report = await asyncio.to_thread(create_video_from_scene_segments, ctx, render_profile(profile))
+    return rendered_report(report)
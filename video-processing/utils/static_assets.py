@@ -0,0 +1,109 @@
+import os
+import logging
+import threading
+import subprocess
+from PIL import Image
+from .cache import ASSET_NAMESPACE, CACHE_DIR, cache_key
+
+logger = logging.getLogger(__name__)
+
+# Derived copies of the static render assets (watermark, background music)
+ASSET_DIR = os.path.join(CACHE_DIR, ASSET_NAMESPACE)
+# Frame width the watermark artwork is drawn for; it is scaled with the output width
+WATERMARK_REFERENCE_WIDTH = 1080
+MUSIC_SAMPLE_RATE = 44100
+
+_lock = threading.Lock()
+_failed = set()
+
+
+def source_signature(path):
+    """
+    (size, mtime) of a source file, or None if it does not exist
+    """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+def prepared_asset(name, source, params, extension, build):
+    """
+    Path of the asset `build(source, dest)` derives from `source` with `params`,
+    built on first use and reused by every job afterwards. The key covers the
+    source's size and mtime, so replacing the source file makes the next lookup
+    rebuild it (older builds with the same params are removed). Returns None if
+    the source is missing or the build fails.
+    """
+    signature = source_signature(source)
+    if signature is None:
+        return None
+    prefix = f"{name}-{cache_key(os.path.abspath(source), params)[:8]}-"
+    path = os.path.join(ASSET_DIR, f"{prefix}{cache_key(signature)[:12]}{extension}")
+    if os.path.exists(path):
+        return path
+
+    with _lock:
+        if os.path.exists(path):
+            return path
+        if path in _failed:
+            return None
+        os.makedirs(ASSET_DIR, exist_ok=True)
+        partial = f"{os.path.splitext(path)[0]}.part{extension}"
+        try:
+            build(source, partial)
+            os.replace(partial, path)
+        except Exception as e:
+            logger.warning("Could not prepare %s from %s: %s", name, source, e)
+            _failed.add(path)
+            if os.path.exists(partial):
+                os.remove(partial)
+            return None
+        for entry in os.listdir(ASSET_DIR):
+            if entry.startswith(prefix) and entry != os.path.basename(path):
+                os.remove(os.path.join(ASSET_DIR, entry))
+
+    logger.info("Prepared %s from %s", name, source)
+    return path
+
+
+def build_watermark(source, dest, frame_width):
+    """
+    Scale the watermark for frame_width and store it as an uncompressed RGBA
+    PAM frame, which ffmpeg reads without inflating or converting anything
+    """
+    with Image.open(source) as image:
+        image = image.convert("RGBA")
+        if frame_width != WATERMARK_REFERENCE_WIDTH:
+            scale = frame_width / WATERMARK_REFERENCE_WIDTH
+            size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+            image = image.resize(size, Image.LANCZOS)
+        header = (f"P7\nWIDTH {image.width}\nHEIGHT {image.height}\nDEPTH 4\nMAXVAL 255\n"
+                  f"TUPLTYPE RGB_ALPHA\nENDHDR\n")
+        with open(dest, "wb") as f:
+            f.write(header.encode("ascii"))
+            f.write(image.tobytes())
+
+
+def build_music_bed(source, dest, volume):
+    """
+    Decode the music once into 16-bit stereo PCM at the output sample rate
+    with its volume already applied
+    """
+    subprocess.run(
+        ["ffmpeg", "-hide_banner", "-loglevel", "error", "-y", "-i", source,
+         "-af", f"volume={volume}", "-ar", str(MUSIC_SAMPLE_RATE), "-ac", "2", "-c:a", "pcm_s16le", dest],
+        check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=300)
+
+
+def prepared_watermark(source, frame_width):
+    return prepared_asset(
+        "watermark", source, [frame_width], ".pam",
+        lambda src, dest: build_watermark(src, dest, frame_width))
+
+
+def prepared_music_bed(source, volume):
+    return prepared_asset(
+        "music_bed", source, [volume, MUSIC_SAMPLE_RATE], ".wav",
+        lambda src, dest: build_music_bed(src, dest, volume))
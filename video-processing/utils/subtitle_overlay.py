@@ -0,0 +1,137 @@
+import os
+import logging
+from functools import lru_cache
+from PIL import Image, ImageDraw, ImageFont
+
+logger = logging.getLogger(__name__)
+
+# Subtitle style
+FONT_SIZE = 50
+FONT_COLOR = "white"
+FONT = "Arial"
+# TrueType file to measure and draw with; the first loadable candidate wins
+FONT_PATH = os.environ.get("SCROLLA_FONT_PATH")
+FONT_CANDIDATES = [FONT_PATH, f"{FONT}.ttf", f"{FONT.lower()}.ttf", "DejaVuSans.ttf"]
+
+BORDER_WIDTH = 1.2
+BORDER_COLOR = "darkgray"
+BOX_COLOR = (0, 0, 0, 128)
+BOX_PADDING = 5
+LINE_SPACING = 20
+
+SUBTITLE_SIDE_GAP = 20
+SUBTITLE_BOTTOM_GAP = 60
+SUBTITLE_MARGIN = 30
+SUBTITLE_VERTICAL_ALIGNMENT = "bottom"
+
+
+@lru_cache(maxsize=None)
+def load_font(size=FONT_SIZE):
+    for candidate in FONT_CANDIDATES:
+        if not candidate:
+            continue
+        try:
+            return ImageFont.truetype(candidate, size)
+        except OSError:
+            continue
+    logger.warning("Font '%s' not found, falling back to Pillow's default font", FONT)
+    return ImageFont.load_default(size)
+
+
+@lru_cache(maxsize=4096)
+def glyph_width(char, size=FONT_SIZE):
+    """
+    Advance width of one character in pixels, measured once per (char, size)
+    """
+    return load_font(size).getlength(char)
+
+
+def text_width(text, size=FONT_SIZE):
+    return sum(glyph_width(char, size) for char in text)
+
+
+def wrap_text(text, max_width, font_size=FONT_SIZE):
+    """
+    Greedily wrap text into lines no wider than max_width pixels, using the
+    font's measured glyph widths. A single word wider than max_width gets a
+    line of its own.
+    """
+    space_width = glyph_width(" ", font_size)
+
+    lines = []
+    current_line = []
+    current_line_width = 0
+
+    for word in text.split():
+        word_width = text_width(word, font_size)
+        if current_line and current_line_width + space_width + word_width > max_width:
+            lines.append(' '.join(current_line))
+            current_line = []
+            current_line_width = 0
+        if current_line:
+            current_line_width += space_width
+        current_line.append(word)
+        current_line_width += word_width
+
+    if current_line:
+        lines.append(' '.join(current_line))
+
+    return lines
+
+
+def calculate_vertical_position(total_lines, font_size, line_spacing, video_height, alignment):
+    total_height = total_lines * font_size + (total_lines - 1) * line_spacing
+    margin = SUBTITLE_MARGIN
+
+    if alignment == "top":
+        return margin
+    elif alignment == "center":
+        return (video_height - total_height) // 2
+    elif alignment == "bottom":
+        return video_height - total_height - margin - SUBTITLE_BOTTOM_GAP
+    else:
+        raise ValueError("Invalid subtitle alignment")
+
+
+def subtitle_max_width(frame_width):
+    return frame_width - 2 * (SUBTITLE_SIDE_GAP + BOX_PADDING)
+
+
+def render_subtitle_overlay(text, output_path, frame_width, frame_height, reserve_lines=1):
+    """
+    Rasterize a subtitle into a transparent RGBA PNG band as wide as the frame:
+    each wrapped line is centered on a translucent box with a thin border, as
+    the drawtext filters used to draw it. The band is sized for at least
+    reserve_lines lines (text sits on the bottom ones), so bands rendered with
+    the same reserve_lines share one size and position. Returns the y offset at
+    which the band goes on the frame, or None if there is nothing to draw.
+    """
+    lines = wrap_text(text, subtitle_max_width(frame_width))
+    if not lines:
+        return None
+
+    font = load_font(FONT_SIZE)
+    stroke_width = max(1, round(BORDER_WIDTH))
+    pitch = FONT_SIZE + LINE_SPACING
+    total_lines = max(len(lines), reserve_lines)
+    top = calculate_vertical_position(
+        total_lines, FONT_SIZE, LINE_SPACING, frame_height, SUBTITLE_VERTICAL_ALIGNMENT)
+    band_top = max(0, top - BOX_PADDING - stroke_width)
+    band_height = min(frame_height - band_top,
+                      total_lines * pitch - LINE_SPACING + 2 * (BOX_PADDING + stroke_width) + FONT_SIZE // 2)
+
+    band = Image.new("RGBA", (frame_width, band_height), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(band)
+    for idx, line in enumerate(lines, start=total_lines - len(lines)):
+        x = (frame_width - text_width(line)) / 2
+        y = top - band_top + pitch * idx
+        left, upper, right, lower = draw.textbbox((x, y), line, font=font, stroke_width=stroke_width)
+        draw.rectangle(
+            (left - BOX_PADDING, upper - BOX_PADDING, right + BOX_PADDING, lower + BOX_PADDING),
+            fill=BOX_COLOR)
+        draw.text((x, y), line, font=font, fill=FONT_COLOR,
+                  stroke_width=stroke_width, stroke_fill=BORDER_COLOR)
+
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    band.save(output_path)
+    return band_top
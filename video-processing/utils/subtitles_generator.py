@@ -1,5 +1,12 @@
 import re
-from .tts import generate_audio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from .captions import scene_cues
+from .manifest import write_scene_manifest
+from .telemetry import span, submit_in_context
+from .tts import generate_audio, TTS_CONCURRENCY
+
+logger = logging.getLogger(__name__)
 
 def format_time(seconds):
     """
@@ -32,41 +39,98 @@ def clean_text(text):
     text = re.sub(r'[^A-Za-z0-9\s.,?!-]', '', text)
     return text
 
-def generate_audio_and_subtitle(json_output, output_srt_path="subtitles.srt"):
+def write_srt(entries, output_srt_path="subtitles.srt"):
     """
-    Generate an SRT file → text & audio durations
+    Write (scene_number, text, duration, cues) entries → SRT file with one
+    subtitle per caption cue, in the given order
     """
-    try:
-        subtitles = []
-        current_time = 0.0
+    subtitles = []
+    current_time = 0.0
+    index = 1
+
+    for scene_number, text, duration, cues in entries:
+        if not duration:
+            continue
+
+        for start, end, cue_text in cues:
+            subtitles.append(f"{index}")
+            subtitles.append(
+                f"{format_time(current_time + start)} --> {format_time(current_time + end)}")
+            subtitles.append(cue_text)
+            subtitles.append("")
+            index += 1
+
+        current_time += duration
+
+    with open(output_srt_path, "w", encoding="utf-8") as srt_file:
+        srt_file.write("\n".join(subtitles))
+    logger.debug("SRT file generated successfully: %s", output_srt_path)
+
+
+def write_timeline(ctx, entries):
+    """
+    Write the job's SRT file and scene manifest from ordered
+    (scene_number, text, duration, cues) entries; scenes without audio are
+    skipped. Cues are stored per scene, relative to the scene start.
+    """
+    write_srt(entries, ctx.srt_path)
 
-        for item in json_output:
-            scene_number = item["scene_number"]
-            text = item["text"]
+    manifest = []
+    current_time = 0.0
+    for scene_number, text, duration, cues in entries:
+        if not duration:
+            continue
+        manifest.append({
+            "scene_number": scene_number,
+            "text": text,
+            "audio": ctx.audio_path(scene_number),
+            "duration": duration,
+            "start": current_time,
+            "end": current_time + duration,
+            "cues": cues,
+        })
+        current_time += duration
+    write_scene_manifest(ctx, manifest)
 
-            text = clean_text(text)
 
-            print(f"Generating audio for scene {scene_number}")
-            duration = generate_audio(text, scene_number)
+def synthesize_scene(text, scene_number, ctx):
+    """
+    Synthesize one scene's audio and time its captions → (duration, cues)
+    """
+    with span("tts", scene=scene_number, chars=len(text)):
+        duration = generate_audio(text, scene_number, ctx.audio_dir)
+    if not duration:
+        return duration, []
+    with span("captions", scene=scene_number) as record:
+        cues = scene_cues(text, ctx.audio_path(scene_number), duration)
+        record["cues"] = len(cues)
+    return duration, cues
+
 
-            if duration:
-                start_time = current_time
-                end_time = current_time + duration
+def generate_audio_and_subtitle(json_output, ctx, max_workers=TTS_CONCURRENCY):
+    """
+    Generate the job's audio files, SRT file and scene manifest → text & audio durations
 
-                start_time_formatted = format_time(start_time)
-                end_time_formatted = format_time(end_time)
+    Scenes are synthesized concurrently (at most `max_workers` Deepgram calls in
+    flight), but the SRT timeline is always laid out in scene order. Durations
+    and caption cues are worked out once here and recorded in the manifest for
+    the renderer.
+    """
+    try:
+        scenes = [(item["scene_number"], clean_text(item["text"])) for item in json_output]
 
-                subtitles.append(f"{scene_number}")
-                subtitles.append(
-                    f"{start_time_formatted} --> {end_time_formatted}")
-                subtitles.append(text)
-                subtitles.append("")
+        def synthesize(scene):
+            scene_number, text = scene
+            logger.info("Generating audio for scene %s", scene_number)
+            return synthesize_scene(text, scene_number, ctx)
 
-                current_time = end_time
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            results = [future.result() for future in
+                       [submit_in_context(executor, synthesize, scene) for scene in scenes]]
 
-        with open(output_srt_path, "w", encoding="utf-8") as srt_file:
-            srt_file.write("\n".join(subtitles))
-        print(f"SRT file generated successfully: {output_srt_path}")
+        write_timeline(
+            ctx, [(scene_number, text, duration, cues)
+                  for (scene_number, text), (duration, cues) in zip(scenes, results)])
 
     except Exception as e:
-        print(f"Error generating SRT file: {e}")
+        logger.error("Error generating SRT file: %s", e)
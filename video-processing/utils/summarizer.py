@@ -0,0 +1,108 @@
+import os
+import asyncio
+import logging
+from pydantic_ai import Agent
+from .cache import summary_cache, cache_key, text_digest
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_MODEL = os.environ.get("SCROLLA_SUMMARY_MODEL", "openai:gpt-4o-mini")
+# Sources up to this size go to the script agent untouched
+SUMMARIZE_THRESHOLD_CHARS = int(os.environ.get("SCROLLA_SUMMARIZE_THRESHOLD_CHARS", 16000))
+CHUNK_CHARS = int(os.environ.get("SCROLLA_SUMMARY_CHUNK_CHARS", 8000))
+SUMMARY_CONCURRENCY = int(os.environ.get("SCROLLA_SUMMARY_CONCURRENCY", 4))
+# Summaries are re-chunked and summarized again until they fit in one reduce call
+MAX_MAP_ROUNDS = 3
+
+CHUNK_PROMPT = """You are condensing one section of a longer article or document that will later be turned into a short narrated video.
+Summarize the section in at most 150 words. Keep concrete facts, numbers, names, dates and any striking claims or quotes.
+Ignore navigation text, headers, footers, advertisements, references and boilerplate. Reply with the summary only."""
+
+REDUCE_PROMPT = """You are given ordered section summaries of one article or document.
+Write a single condensed brief of at most 600 words that preserves the overall narrative, the key facts and numbers, and the most engaging points, in the order they appear.
+Reply with the brief only."""
+
+chunk_agent = Agent(
+    model=SUMMARY_MODEL,
+    system_prompt=CHUNK_PROMPT,
+    result_type=str,
+    name="Chunk Summarizer",
+)
+
+reduce_agent = Agent(
+    model=SUMMARY_MODEL,
+    system_prompt=REDUCE_PROMPT,
+    result_type=str,
+    name="Brief Writer",
+)
+
+
+def split_into_chunks(text, chunk_chars=CHUNK_CHARS):
+    """
+    Split text into chunks of at most chunk_chars, preferring paragraph and then
+    line boundaries so sections are not cut mid-sentence where avoidable.
+    """
+    chunks = []
+    current = []
+    current_len = 0
+
+    for paragraph in text.split("\n\n"):
+        pieces = [paragraph]
+        if len(paragraph) > chunk_chars:
+            pieces = [paragraph[i:i + chunk_chars] for i in range(0, len(paragraph), chunk_chars)]
+
+        for piece in pieces:
+            if current and current_len + len(piece) + 2 > chunk_chars:
+                chunks.append("\n\n".join(current))
+                current = []
+                current_len = 0
+            current.append(piece)
+            current_len += len(piece) + 2
+
+    if current:
+        chunks.append("\n\n".join(current))
+    return [chunk for chunk in chunks if chunk.strip()]
+
+
+async def summarize(agent, prompt, text):
+    """
+    Run one summarization call, cached by (text hash, model, prompt)
+    """
+    key = cache_key(text_digest(text), SUMMARY_MODEL, prompt)
+    cached = summary_cache.get_text(key)
+    if cached is not None:
+        return cached
+
+    result = await agent.run(text)
+    summary = result.data.strip()
+    summary_cache.put_text(key, summary)
+    return summary
+
+
+async def condense_source(text, threshold=SUMMARIZE_THRESHOLD_CHARS, concurrency=SUMMARY_CONCURRENCY):
+    """
+    Map-reduce long sources into a brief before script generation: chunks are
+    summarized concurrently (bounded by `concurrency`) and the summaries are
+    reduced to one brief, so LLM time stays roughly flat as documents grow.
+    """
+    if len(text) <= threshold:
+        return text
+
+    limit = asyncio.Semaphore(max(1, concurrency))
+
+    async def summarize_chunk(chunk):
+        async with limit:
+            return await summarize(chunk_agent, CHUNK_PROMPT, chunk)
+
+    level = text
+    for round_number in range(1, MAX_MAP_ROUNDS + 1):
+        chunks = split_into_chunks(level)
+        logger.info("Summarizing %d chunks (round %d)", len(chunks), round_number)
+        summaries = await asyncio.gather(*(summarize_chunk(chunk) for chunk in chunks))
+        level = "\n\n".join(summaries)
+        if len(level) <= CHUNK_CHARS:
+            break
+
+    brief = await summarize(reduce_agent, REDUCE_PROMPT, level)
+    logger.info("Condensed %d chars into a %d char brief", len(text), len(brief))
+    return brief
@@ -0,0 +1,217 @@
+import os
+import time
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+
+LOG_LEVEL = os.environ.get("SCROLLA_LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+# Upper bounds (seconds) of the stage duration histogram buckets
+DURATION_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+logger = logging.getLogger(__name__)
+
+_current_report = contextvars.ContextVar("scrolla_job_report", default=None)
+
+
+def configure_logging(level=LOG_LEVEL):
+    """
+    Send every logger to stderr at `level`. Messages below it are dropped
+    before their arguments are formatted.
+    """
+    logging.basicConfig(level=getattr(logging, level, logging.INFO), format=LOG_FORMAT)
+
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"') for value in labels.values())
+    return "{" + ",".join(f'{key}="{value}"' for key, value in zip(labels, escaped)) + "}"
+
+
+class MetricsRegistry:
+    """
+    Thread-safe counters, gauges and histograms rendered in the Prometheus
+    text exposition format
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._help = {}
+        self._types = {}
+        self._values = {}
+        self._histograms = {}
+        self._collectors = []
+
+    def _declare(self, name, kind, help_text):
+        self._types.setdefault(name, kind)
+        self._help.setdefault(name, help_text)
+
+    def inc(self, name, amount=1, help_text="", **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._declare(name, "counter", help_text)
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def set(self, name, value, help_text="", **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._declare(name, "gauge", help_text)
+            self._values[key] = value
+
+    def observe(self, name, value, help_text="", buckets=DURATION_BUCKETS, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._declare(name, "histogram", help_text)
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = {"buckets": buckets, "counts": [0] * len(buckets),
+                                                     "count": 0, "sum": 0.0}
+            for i, bound in enumerate(histogram["buckets"]):
+                if value <= bound:
+                    histogram["counts"][i] += 1
+            histogram["count"] += 1
+            histogram["sum"] += value
+
+    def register_collector(self, collect):
+        """
+        Add a callable returning [(name, type, help, labels, value)] samples,
+        read at scrape time (for state that is kept elsewhere, like cache hits)
+        """
+        with self._lock:
+            self._collectors.append(collect)
+
+    def render(self):
+        samples = {}
+        with self._lock:
+            types = dict(self._types)
+            helps = dict(self._help)
+            for (name, labels), value in self._values.items():
+                samples.setdefault(name, []).append((dict(labels), value))
+            histograms = {key: dict(value, counts=list(value["counts"])) for key, value in self._histograms.items()}
+            collectors = list(self._collectors)
+
+        for collect in collectors:
+            for name, kind, help_text, labels, value in collect():
+                types.setdefault(name, kind)
+                helps.setdefault(name, help_text)
+                samples.setdefault(name, []).append((labels, value))
+
+        lines = []
+        for name in sorted(set(samples) | {name for name, _ in histograms}):
+            if helps.get(name):
+                lines.append(f"# HELP {name} {helps[name]}")
+            lines.append(f"# TYPE {name} {types[name]}")
+            for labels, value in samples.get(name, []):
+                lines.append(f"{name}{format_labels(labels)} {value}")
+            for (histogram_name, labels), histogram in histograms.items():
+                if histogram_name != name:
+                    continue
+                labels = dict(labels)
+                for bound, count in zip(histogram["buckets"], histogram["counts"]):
+                    lines.append(f"{name}_bucket{format_labels(dict(labels, le=bound))} {count}")
+                lines.append(f"{name}_bucket{format_labels(dict(labels, le='+Inf'))} {histogram['count']}")
+                lines.append(f"{name}_sum{format_labels(labels)} {round(histogram['sum'], 6)}")
+                lines.append(f"{name}_count{format_labels(labels)} {histogram['count']}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+
+class JobReport:
+    """
+    Spans and counters recorded while one job runs, for its timing report
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.perf_counter()
+        self.spans = []
+        self.counters = {}
+
+    def add_span(self, record):
+        with self._lock:
+            self.spans.append(record)
+
+    def count(self, name, amount=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def summary(self):
+        """
+        Total wall time, summed seconds per stage, counters and every span
+        """
+        with self._lock:
+            spans = list(self.spans)
+            counters = dict(self.counters)
+        stages = {}
+        for record in spans:
+            stages[record["stage"]] = round(stages.get(record["stage"], 0) + record["seconds"], 3)
+        return {
+            "total_seconds": round(time.perf_counter() - self.started, 3),
+            "stages": stages,
+            "counters": counters,
+            "spans": spans,
+        }
+
+
+def start_job_report():
+    """
+    Attach a new report to the current context; spans opened from it, its
+    asyncio tasks and its to_thread calls are recorded on it
+    """
+    report = JobReport()
+    _current_report.set(report)
+    return report
+
+
+def current_job_report():
+    return _current_report.get()
+
+
+def count(name, amount=1):
+    """
+    Add to the current job's counters and the process-wide metric of that name
+    """
+    metrics.inc(f"scrolla_{name}_total", amount)
+    report = _current_report.get()
+    if report is not None:
+        report.count(name, amount)
+
+
+@contextmanager
+def span(stage, **attributes):
+    """
+    Time a pipeline stage. The duration goes into the
+    scrolla_stage_duration_seconds histogram and, with `attributes` (e.g.
+    scene=3), onto the current job's report. The yielded dict can be filled
+    with more attributes before the span ends.
+    """
+    record = dict(attributes)
+    started = time.perf_counter()
+    status = "ok"
+    try:
+        yield record
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        seconds = time.perf_counter() - started
+        metrics.observe("scrolla_stage_duration_seconds", seconds,
+                        "Wall time of pipeline stages", stage=stage, status=status)
+        report = _current_report.get()
+        if report is not None:
+            report.add_span(dict(record, stage=stage, seconds=round(seconds, 3), status=status))
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("%s finished in %.3fs %s", stage, seconds, record)
+
+
+def submit_in_context(executor, fn, *args):
+    """
+    executor.submit() that runs fn in a copy of the caller's context, so spans
+    opened on pool threads still land on the current job's report
+    """
+    return executor.submit(contextvars.copy_context().run, fn, *args)
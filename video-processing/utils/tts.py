@@ -1,47 +1,59 @@
 import os
-import requests
-import subprocess
+import logging
+from .audio_duration import mp3_duration
+from .cache import audio_cache, cache_key
+from .http_client import download_to_file
 
-url = "https://api.deepgram.com/v1/speak?model=aura-asteria-en"
+logger = logging.getLogger(__name__)
+
+VOICE_MODEL = "aura-asteria-en"
+
+url = f"https://api.deepgram.com/v1/speak?model={VOICE_MODEL}"
 headers = {
     'Authorization': f'Token {os.environ.get("DEEPGRAM_API_KEY")}',
     'Content-Type': 'text/plain'
 }
 
+# Max number of Deepgram requests in flight for a single job
+TTS_CONCURRENCY = int(os.environ.get("SCROLLA_TTS_CONCURRENCY", 4))
+
 def get_audio_length(audio_path):
     """
-    Get the duration of an audio file using FFmpeg
+    Get the duration of an MP3 file from its frame headers (no subprocess)
     """
     try:
-        command = [
-            "ffprobe", "-i", audio_path,
-            "-show_entries", "format=duration",
-            "-v", "quiet", "-of", "csv=p=0"
-        ]
-        result = subprocess.run(
-            command, capture_output=True, text=True, check=True)
-        return float(result.stdout.strip())
+        duration = mp3_duration(audio_path)
+        if duration is None:
+            logger.warning("No MPEG audio frames found in %s", audio_path)
+            return 0
+        return duration
     except Exception as e:
-        print(f"Error getting audio duration: {e}")
+        logger.error("Error getting audio duration: %s", e)
         return 0
 
 
-def generate_audio(text, scene):
+def generate_audio(text, scene, audio_dir='audios'):
     if not text or not scene:
         return None
     
-    os.makedirs('audios', exist_ok=True)
-    
-    response = requests.request("POST", url, headers=headers, data=text)
-    
-    if response.status_code == 200:
-        audio_path = f'audios/scene{scene}.mp3'
-        with open(audio_path, 'wb') as f:
-            f.write(response.content)
-        print(f"Audio file saved successfully as '{audio_path}'")
-        
-        duration = get_audio_length(audio_path)
-        return duration
-    else:
-        print(f"Error: {response.text}")
+    os.makedirs(audio_dir, exist_ok=True)
+    audio_path = os.path.join(audio_dir, f'scene{scene}.mp3')
+
+    key = cache_key(text, VOICE_MODEL)
+    if audio_cache.get_file(key, audio_path):
+        logger.info("Audio for scene %s served from cache", scene)
+        return get_audio_length(audio_path)
+
+    try:
+        download_to_file(
+            "POST", url, audio_path, expected_types=("audio/",),
+            headers=headers, data=text.encode("utf-8"))
+    except Exception as e:
+        logger.error("Error generating audio for scene %s: %s", scene, e)
         return None
+
+    logger.debug("Audio file saved successfully as '%s'", audio_path)
+    audio_cache.put_file(key, audio_path)
+
+    duration = get_audio_length(audio_path)
+    return duration
@@ -1,307 +1,824 @@
 import os
+import re
+import math
+import logging
 import subprocess
-from PIL import Image
-import pysrt 
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image, ImageOps
+from .audio_duration import mp3_duration
+from .cache import cache_key, file_digest
+from .encoder import encoder_args, encode_slot, timed_encodes, select_encoder, split_threads, RENDER_WORKERS
+from .manifest import read_scene_manifest, update_scene_manifest
+from .static_assets import prepared_music_bed, prepared_watermark
+from .subtitle_overlay import render_subtitle_overlay, subtitle_max_width, wrap_text
+from .telemetry import count, metrics, span, submit_in_context
+
+logger = logging.getLogger(__name__)
 
 # Configuration
-FONT_SIZE = 50
-FONT_COLOR = "white"
-FONT = "Arial"
+ADD_SUBTITLES = True
 
-BORDER_WIDTH = 1.2
-BORDER_COLOR = "darkgray"
+VIDEO_WIDTH = 1080
+VIDEO_HEIGHT = 1920
+VIDEO_FPS = 30
+
+WATERMARK_PATH = "watermark_Scrolla.png"
+WATERMARK_PADDING_TOP = 30
+BG_MUSIC_PATH = "bg_music.mp3"
+BG_MUSIC_VOLUME = 0.5
+
+# "single_pass" builds one filter graph for the whole short and encodes once,
+# "segments" encodes every scene to a temp file and joins them afterwards,
+# "streaming" does the same but encodes each scene as soon as its image and
+# audio exist, overlapping encodes with the remaining TTS/image generation.
+RENDER_MODE = os.environ.get("SCROLLA_RENDER_MODE", "single_pass")
+
+# Encode settings for still-image shorts. Frames between fades are identical,
+# so x264 runs with -tune stillimage and the frame rate is the main cost lever:
+# "fast-preview" encodes half as many frames with a fast preset, "publish" (the
+# default) keeps x264's own medium/CRF 23 at full frame rate, and
+# "high-quality" spends extra encode time on quality and must be asked for.
+RENDER_PROFILES = {
+    "fast-preview": {"preset": "veryfast", "crf": 28, "fps": 15, "audio_bitrate": "128k"},
+    "publish": {"preset": "medium", "crf": 23, "fps": VIDEO_FPS, "audio_bitrate": "384k"},
+    "high-quality": {"preset": "slow", "crf": 20, "fps": VIDEO_FPS, "audio_bitrate": "384k"},
+}
+RENDER_PROFILE = os.environ.get("SCROLLA_RENDER_PROFILE", "publish")
+# Optional overrides of the selected profile's preset / CRF
+X264_PRESET = os.environ.get("SCROLLA_X264_PRESET")
+X264_CRF = os.environ.get("SCROLLA_X264_CRF")
+# Slow zoom over each still; every frame then differs, so encodes get slower
+KEN_BURNS = os.environ.get("SCROLLA_KEN_BURNS", "0") == "1"
+KEN_BURNS_MAX_ZOOM = 1.1
+# Extra renditions of the short, encoded by the final render stage from the same
+# decoded frames as output_video (split and scaled in its filter graph)
+RENDITION_LADDER = {
+    "720p": {"width": 720, "height": 1280, "crf": 23, "audio_bitrate": "128k"},
+    "preview": {"width": 360, "height": 640, "crf": 30, "fps": 15, "audio_bitrate": "64k"},
+}
+RENDITIONS = [name.strip() for name in os.environ.get("SCROLLA_RENDITIONS", ",".join(RENDITION_LADDER)).split(",")
+              if name.strip()]
+# Fragmented MP4 (empty moov, then self-contained fragments) can be served
+# progressively without a faststart rewrite
+FRAGMENTED_MP4 = os.environ.get("SCROLLA_FRAGMENTED_MP4", "1") == "1"
+POSTER_QUALITY = 85
+# Filter graph labels that name an input stream rather than a filter output
+INPUT_STREAM_LABEL = re.compile(r"\[\d+:[av]\]$")
+
+# Part of every segment key; bump it when the segment filter graph or the
+# subtitle style changes, so jobs stop reusing segments rendered the old way
+SEGMENT_FORMAT_VERSION = 1
+
+
+def render_profile(name=RENDER_PROFILE):
+    """
+    Resolve a render profile by name, applying the preset/CRF env overrides
+    """
+    if name not in RENDER_PROFILES:
+        raise ValueError(f"Unknown render profile: {name}")
+    profile = dict(RENDER_PROFILES[name], name=name)
+    if X264_PRESET:
+        profile["preset"] = X264_PRESET
+    if X264_CRF:
+        profile["crf"] = int(X264_CRF)
+    return profile
 
-SUBTITLE_X_POSITION = "(w-tw)/2"
-SUBTITLE_BOTTOM_GAP = 60
-SUBTITLE_MARGIN = 30
-SUBTITLE_VERTICAL_ALIGNMENT = "bottom"
 
-ADD_SUBTITLES = True
+def video_encoder_args(profile, threads=None):
+    """
+    Encoder arguments for a profile. Still-image tuning is dropped when Ken Burns
+    is on, since the frames are no longer static.
+    """
+    return encoder_args(profile, still_image=not KEN_BURNS, threads=threads)
 
 
-def read_srt_file(srt_file):
+def watermark_input():
     """
-    Read subtitles from SRT file
+    Watermark frame to overlay: the pre-scaled copy from the asset cache, or
+    the original PNG if it could not be prepared (None without a watermark)
     """
-    try:
-        subs = pysrt.open(srt_file)
-        return [sub.text.replace('\n', ' ') for sub in subs]
-    except Exception as e:
-        print(f"Error reading SRT file: {e}")
-        return []
+    if not os.path.exists(WATERMARK_PATH):
+        return None
+    return prepared_watermark(WATERMARK_PATH, VIDEO_WIDTH) or WATERMARK_PATH
 
 
-def wrap_text(text, max_width, font_size=FONT_SIZE, font_path=None):
-    effective_width = max_width * 0.8
-    char_width = font_size * 0.6 
-    space_width = font_size * 0.3  
+def music_input():
+    """
+    (path, level filter) of the background music, or None without it
+    """
+    if not os.path.exists(BG_MUSIC_PATH):
+        return None
+    bed = prepared_music_bed(BG_MUSIC_PATH, BG_MUSIC_VOLUME)
+    if bed:
+        return bed, "anull"
+    return BG_MUSIC_PATH, f"volume={BG_MUSIC_VOLUME}"
 
-    lines = []
-    current_line = []
-    current_line_width = 0
 
-    words = text.split()
+def prepare_static_assets():
+    """
+    Build the cached watermark and music bed ahead of the first render
+    """
+    watermark_input()
+    music_input()
 
-    for word in words:
-        word_width = len(word) * char_width + space_width
 
-        if current_line_width + word_width <= effective_width:
-            current_line.append(word)
-            current_line_width += word_width
-        else:
-            if current_line:
-                lines.append(' '.join(current_line))
-            current_line = [word]
-            current_line_width = word_width
+def container_args():
+    if FRAGMENTED_MP4:
+        return ["-movflags", "+frag_keyframe+empty_moov+default_base_moof"]
+    return ["-movflags", "+faststart"]
 
-    if current_line:
-        lines.append(' '.join(current_line))
 
-    return lines
+def rendition_paths(ctx):
+    """
+    Output path of every configured rendition, by name
+    """
+    paths = {}
+    for name in RENDITIONS:
+        if name not in RENDITION_LADDER:
+            logger.warning("Unknown rendition '%s', use one of: %s", name, ", ".join(RENDITION_LADDER))
+            continue
+        paths[name] = ctx.rendition_path(name)
+    return paths
 
 
-def calculate_vertical_position(total_lines, font_size, line_spacing, video_height, alignment):
-    total_height = total_lines * font_size + (total_lines - 1) * line_spacing
-    margin = SUBTITLE_MARGIN
+def map_label(label):
+    """
+    -map value for a graph label: input streams are mapped without brackets
+    """
+    return label.strip("[]") if INPUT_STREAM_LABEL.match(label) else label
 
-    if alignment == "top":
-        return margin
-    elif alignment == "center":
-        return (video_height - total_height) // 2
-    elif alignment == "bottom":
-        return video_height - total_height - margin - SUBTITLE_BOTTOM_GAP
-    else:
-        raise ValueError("Invalid subtitle alignment")
 
+def fan_out(graph, label, count, prefix):
+    """
+    Split `label` for `count` renditions → (main output's -map value, rendition labels)
+    """
+    direct = INPUT_STREAM_LABEL.match(label) is not None
+    total = count + (0 if direct else 1)
+    labels = [f"[{prefix}{k}]" for k in range(total)]
+    split = "asplit" if prefix.startswith("a") else "split"
+    graph.append(f"{label}{split}={total}{''.join(labels)}")
+    if direct:
+        return map_label(label), labels
+    return labels[0], labels[1:]
 
-def preprocess_image_if_needed(input_path, output_path):
-    img = Image.open(input_path)
-    width, height = img.size
 
-    target_width = 1080
-    target_height = 1920
+def add_renditions(graph, video_label, audio_label, profile, renditions, main_encoded=True):
+    """
+    Feed the renditions ({name: path}) from the graph's final stage. Returns
+    (video map, audio map, threads) for the main output and the renditions' args.
+    """
+    if not renditions:
+        return map_label(video_label), map_label(audio_label), None, []
+
+    ladder = [RENDITION_LADDER[name] for name in renditions]
+    fps = [rendition.get("fps", profile["fps"]) for rendition in ladder]
+    weights = [rendition["width"] * rendition["height"] * rate for rendition, rate in zip(ladder, fps)]
+    if main_encoded:
+        weights.insert(0, VIDEO_WIDTH * VIDEO_HEIGHT * profile["fps"])
+    threads = split_threads(weights)
+    main_threads = threads.pop(0) if main_encoded else None
+
+    main_video, videos = fan_out(graph, video_label, len(renditions), "vr")
+    main_audio, audios = fan_out(graph, audio_label, len(renditions), "ar")
+    output_args = []
+    for (name, path), video, audio, rendition, fps, rendition_threads in zip(
+            renditions.items(), videos, audios, ladder, fps, threads):
+        frame_rate = f"fps={fps}," if fps != profile["fps"] else ""
+        graph.append(f"{video}{frame_rate}scale={rendition['width']}:{rendition['height']}:flags=bicubic[v_{name}]")
+        output_args += [
+            "-map", f"[v_{name}]",
+            "-map", audio,
+            *video_encoder_args(dict(profile, crf=rendition["crf"], fps=fps), rendition_threads),
+            "-c:a", "aac",
+            "-b:a", rendition["audio_bitrate"],
+            *container_args(),
+            path,
+        ]
+    return main_video, main_audio, main_threads, output_args
 
-    width_ratio = target_width / width
-    height_ratio = target_height / height
 
-    scale_ratio = min(width_ratio, height_ratio)
+def write_poster(ctx, scenes):
+    """
+    Poster thumbnail: the first scene's image letterboxed to the frame size, as
+    a JPEG next to the video
+    """
+    with Image.open(scenes[0]["image"]) as image:
+        poster = ImageOps.pad(image.convert("RGB"), (VIDEO_WIDTH, VIDEO_HEIGHT), Image.LANCZOS, color="black")
+    poster.save(ctx.poster_path, "JPEG", quality=POSTER_QUALITY)
+    return ctx.poster_path
 
-    new_width = int(width * scale_ratio)
-    new_height = int(height * scale_ratio)
 
-    img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
+def finish_render(ctx, scenes, report):
+    """
+    Write the poster and list the render's output files on its report
+    """
+    report["outputs"] = {
+        "video": ctx.output_video,
+        "poster": write_poster(ctx, scenes),
+        "renditions": {name: path for name, path in rendition_paths(ctx).items() if os.path.exists(path)},
+    }
+    return report
 
-    new_img = Image.new('RGB', (target_width, target_height), (0, 0, 0))
-    paste_x = (target_width - new_width) // 2
-    paste_y = (target_height - new_height) // 2
 
-    new_img.paste(img, (paste_x, paste_y))
-    new_img.save(output_path, quality=100)
+def scene_frames(duration, fps):
+    return max(1, math.ceil(duration * fps))
 
 
-def preprocess_images(input_dir, output_dir):
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
+def encode_report(profile, output_video, scenes, elapsed, encoded=None):
+    """
+    Summarize an encode: frames per second of wall time and output bitrate.
+    `encoded` lists the scenes actually encoded when others were reused.
+    """
+    encoded = scenes if encoded is None else encoded
+    frames = sum(scene_frames(scene["duration"], profile["fps"]) for scene in encoded)
+    duration = sum(scene["duration"] for scene in scenes)
+    size = os.path.getsize(output_video) if os.path.exists(output_video) else 0
+    report = {
+        "profile": profile["name"],
+        "scenes_encoded": len(encoded),
+        "scenes_reused": len(scenes) - len(encoded),
+        "frames": frames,
+        "encode_seconds": round(elapsed, 2),
+        "encode_fps": round(frames / elapsed, 1) if elapsed else None,
+        "bitrate_kbps": round(size * 8 / duration / 1000, 1) if duration else None,
+    }
+    if report["encode_fps"]:
+        metrics.set("scrolla_encode_fps", report["encode_fps"],
+                    "Encode frames per second of the latest render", profile=profile["name"])
+    metrics.inc("scrolla_encoded_frames_total", frames, "Video frames encoded", profile=profile["name"])
+    logger.info("Encoded %d frames with profile '%s' at %s fps, output bitrate %s kbps",
+                frames, profile["name"], report["encode_fps"], report["bitrate_kbps"])
+    return report
+
+
+def build_still_filter(image_label, scene, profile, watermark_label=None, subtitle_label=None,
+                       fade_in=False, fade_out=False):
+    """
+    Filter chain turning one scene's still image into its video stream: the
+    frame is composited once and only then looped for the scene's duration
+    """
+    duration = scene["duration"]
+    fps = profile["fps"]
+    frames = scene_frames(duration, fps)
+    label = f"still{scene['scene_number']}"
+
+    chain = [
+        f"{image_label}scale={VIDEO_WIDTH}:{VIDEO_HEIGHT}:force_original_aspect_ratio=decrease:flags=lanczos",
+        f"pad={VIDEO_WIDTH}:{VIDEO_HEIGHT}:(ow-iw)/2:(oh-ih)/2:color=black",
+        "setsar=1",
+    ]
+    if KEN_BURNS:
+        zoom_step = (KEN_BURNS_MAX_ZOOM - 1) / frames
+        chain.append(
+            f"zoompan=z='min(zoom+{zoom_step:.6f},{KEN_BURNS_MAX_ZOOM})':d={frames}:"
+            f"x='iw/2-(iw/zoom/2)':y='ih/2-(ih/zoom/2)':s={VIDEO_WIDTH}x{VIDEO_HEIGHT}:fps={fps}")
+
+    overlays = []
+    if watermark_label:
+        overlays.append((watermark_label, f"(W-w)/2:{WATERMARK_PADDING_TOP}"))
+    if subtitle_label and not scene.get("subtitle_timed"):
+        overlays.append((subtitle_label, f"0:{scene['subtitle_y']}"))
+    for n, (overlay_label, position) in enumerate(overlays):
+        chain[-1] += f"[{label}_{n}]; [{label}_{n}]{overlay_label}overlay={position}"
+
+    if not KEN_BURNS:
+        chain.append(f"loop=loop={frames - 1}:size=1:start=0")
+    chain.append(f"setpts=N/({fps}*TB)")
+    if subtitle_label and scene.get("subtitle_timed"):
+        chain[-1] += (f"[{label}_timed]; [{label}_timed]{subtitle_label}"
+                      f"overlay=0:{scene['subtitle_y']}:eof_action=repeat")
+    if fade_in:
+        chain.append("fade=t=in:st=0:d=1")
+    if fade_out:
+        chain.append(f"fade=t=out:st={max(duration - 0.5, 0)}:d=0.5")
+    chain.append("format=yuv420p")
+    return ",".join(chain)
+
+
+def attach_subtitle_overlay(ctx, scene):
+    """
+    Rasterize the scene's caption cues once into transparent PNGs (an ffconcat
+    list of them when there are several) and record them on the scene
+    """
+    if not ADD_SUBTITLES:
+        return scene
+    cues = scene.get("cues")
+    if not cues and scene["subtitle"].strip():
+        cues = [[0.0, scene["duration"], scene["subtitle"]]]
+    if not cues:
+        return scene
+    with span("subtitle_overlay", scene=scene["scene_number"], cues=len(cues)):
+        return _attach_cue_overlays(ctx, scene, cues)
+
+
+def _attach_cue_overlays(ctx, scene, cues):
+    scene_number = scene["scene_number"]
+    if len(cues) == 1:
+        overlay_path = ctx.subtitle_overlay_path(scene_number)
+        y = render_subtitle_overlay(cues[0][2], overlay_path, VIDEO_WIDTH, VIDEO_HEIGHT)
+        if y is not None:
+            scene.update(subtitle_overlay=overlay_path, subtitle_y=y)
+        return scene
+
+    max_width = subtitle_max_width(VIDEO_WIDTH)
+    reserve_lines = max(len(wrap_text(text, max_width)) for _, _, text in cues)
+    listing = ["ffconcat version 1.0"]
+    for index, (start, end, text) in enumerate(cues):
+        overlay_path = ctx.subtitle_overlay_path(scene_number, index)
+        y = render_subtitle_overlay(text, overlay_path, VIDEO_WIDTH, VIDEO_HEIGHT, reserve_lines)
+        listing += [f"file '{overlay_path}'", f"duration {end - start:.3f}"]
+    # The concat demuxer only honours the last duration if the file is listed again
+    listing.append(f"file '{overlay_path}'")
+
+    list_path = ctx.caption_list_path(scene_number)
+    with open(list_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(listing) + "\n")
+    scene.update(subtitle_overlay=list_path, subtitle_y=y, subtitle_timed=True)
+    return scene
+
+
+def subtitle_input_args(scene):
+    """
+    ffmpeg input arguments for the scene's caption overlay
+    """
+    if scene.get("subtitle_timed"):
+        return ["-f", "concat", "-safe", "0", "-i", scene["subtitle_overlay"]]
+    return ["-i", scene["subtitle_overlay"]]
 
-    image_count = 1
-    for filename in sorted(os.listdir(input_dir)):
-        if filename.endswith((".jpg", ".jpeg", ".png")):
-            input_path = os.path.join(input_dir, filename)
-            output_path = os.path.join(output_dir, f"image{image_count}.jpg")
 
-            if not os.path.exists(output_path):
-                preprocess_image_if_needed(input_path, output_path)
+def collect_scenes(ctx, overlays=True):
+    """
+    List the job's scenes that have both an image and an audio file, in scene
+    order. With overlays=False subtitle overlays are attached later.
+    """
+    manifest = read_scene_manifest(ctx)
+    if manifest:
+        scene_numbers = sorted(manifest)
+    else:
+        scene_numbers = sorted(
+            int(match.group(1))
+            for match in (re.match(r"scene(\d+)\.mp3$", x) for x in os.listdir(ctx.audio_dir))
+            if match
+        )
+    logger.info("Found %d scenes", len(scene_numbers))
+
+    scenes = []
+    for i in scene_numbers:
+        image_path = ctx.find_image(i)
+        audio_path = ctx.audio_path(i)
+
+        if not image_path or not os.path.exists(audio_path):
+            logger.warning("Missing files for scene %s", i)
+            continue
+
+        entry = manifest.get(i, {})
+        audio_duration = entry.get("duration") or mp3_duration(audio_path)
+        if not audio_duration:
+            logger.warning("Could not determine duration for %s", audio_path)
+            continue
+
+        scene = {
+            "scene_number": i,
+            "image": image_path,
+            "audio": audio_path,
+            "duration": audio_duration,
+            "subtitle": entry.get("text", ""),
+            "cues": entry.get("cues"),
+        }
+        scenes.append(attach_subtitle_overlay(ctx, scene) if overlays else scene)
+
+    return scenes
+
+
+def scene_start_frames(scenes, profile):
+    starts, frame = [], 0
+    for scene in scenes:
+        starts.append(frame)
+        frame += scene_frames(scene["duration"], profile["fps"])
+    return starts
+
+
+def scenes_cuttable():
+    # Forced IDR frames are only requested from libx264
+    return select_encoder() == "libx264"
+
+
+def scene_keyframe_args(scenes, profile):
+    """
+    Force an IDR frame at every scene start, so a scene can later be cut out of
+    the single-pass output without re-encoding it
+    """
+    if not scenes_cuttable() or len(scenes) < 2:
+        return []
+    # Half a frame early, so rounding can never push the keyframe to the next frame
+    times = [f"{(start - 0.5) / profile['fps']:.6f}" for start in scene_start_frames(scenes, profile)[1:]]
+    return ["-force_key_frames", ",".join(times), "-forced-idr", "1"]
 
-            image_count += 1
 
+def record_pass_layout(ctx, scenes, profile):
+    """
+    Store where each scene sits in a single-pass output, under the key its
+    segment would have, for cut_pass_segments
+    """
+    if not scenes_cuttable():
+        return
+    last = len(scenes) - 1
+    update_scene_manifest(ctx, {
+        scene["scene_number"]: {
+            "pass_segment": segment_key(scene, profile, k == 0, k == last),
+            "pass_start": start,
+            "pass_frames": scene_frames(scene["duration"], profile["fps"]),
+        }
+        for k, (scene, start) in enumerate(zip(scenes, scene_start_frames(scenes, profile)))
+    })
+
+
+def build_cut_command(scene, output_video, start, frames, segment, profile):
+    """
+    Stream-copy one scene's frames out of a single-pass output and pair them
+    with the scene's own audio (the output's audio has the music mixed in)
+    """
+    return [
+        "ffmpeg", "-y",
+        "-ss", f"{(start + 0.5) / profile['fps']:.6f}",
+        "-i", output_video,
+        "-i", scene["audio"],
+        "-map", "0:v",
+        "-map", "1:a",
+        "-frames:v", str(frames),
+        "-c:v", "copy",
+        "-c:a", "aac",
+        "-b:a", profile["audio_bitrate"],
+        "-ar", "44100",
+        "-ac", "2",
+        "-shortest",
+        "-avoid_negative_ts", "make_zero",
+        segment,
+    ]
+
+
+def cut_pass_segments(ctx, previous, profile):
+    """
+    Cut unchanged scenes out of a single-pass output as segments, so a
+    re-render only encodes the changed ones. Returns how many were cut.
+    """
+    if not os.path.exists(ctx.output_video):
+        return 0
+    scenes = collect_scenes(ctx, overlays=False)
+    cut = 0
+    for k, scene in enumerate(scenes):
+        entry = previous.get(scene["scene_number"], {})
+        if not entry.get("pass_segment"):
+            continue
+        key = segment_key(scene, profile, k == 0, k == len(scenes) - 1)
+        segment = ctx.segment_path(key)
+        if entry["pass_segment"] != key or os.path.exists(segment):
+            continue
+
+        os.makedirs(ctx.segments_dir, exist_ok=True)
+        partial = ctx.segment_path(f"{key}.part")
+        command = build_cut_command(scene, ctx.output_video, entry["pass_start"], entry["pass_frames"],
+                                    partial, profile)
+        with span("cut.segment", scene=scene["scene_number"]):
+            result = subprocess.run(command, stderr=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+        if result.returncode != 0:
+            logger.warning("Could not cut scene %s from the output, it will be encoded: %s",
+                           scene["scene_number"], result.stderr[-300:])
+            if os.path.exists(partial):
+                os.remove(partial)
+            continue
+        os.replace(partial, segment)
+        count("segments_cut")
+        cut += 1
+    return cut
+
+
+def build_single_pass_command(scenes, output_video, profile, renditions=None):
+    """
+    Build one ffmpeg invocation rendering every scene, and the renditions
+    ({name: path}), from a single filter graph
+    """
+    watermark = watermark_input()
+    music = music_input()
+    total_duration = sum(scene["duration"] for scene in scenes)
+    scene_count = len(scenes)
+
+    command = ["ffmpeg", "-y"]
+    for scene in scenes:
+        command += [
+            "-framerate", str(profile["fps"]),
+            "-i", scene["image"],
+            "-i", scene["audio"],
+        ]
 
-def get_audio_duration(audio_path):
+    next_input = 2 * scene_count
+    if watermark:
+        watermark_index = next_input
+        command += ["-i", watermark]
+        next_input += 1
+    if music:
+        music_index = next_input
+        command += ["-stream_loop", "-1", "-i", music[0]]
+        next_input += 1
+    subtitle_inputs = {}
+    for k, scene in enumerate(scenes):
+        if scene.get("subtitle_overlay"):
+            subtitle_inputs[k] = next_input
+            command += subtitle_input_args(scene)
+            next_input += 1
+
+    graph = []
+    if watermark:
+        watermark_labels = ''.join(f"[wm{k}]" for k in range(scene_count))
+        graph.append(f"[{watermark_index}:v]split={scene_count}{watermark_labels}")
+
+    concat_inputs = []
+    for k, scene in enumerate(scenes):
+        watermark_label = f"[wm{k}]" if watermark else None
+        subtitle_label = f"[{subtitle_inputs[k]}:v]" if k in subtitle_inputs else None
+        video_filter = build_still_filter(f"[{2 * k}:v]", scene, profile, watermark_label, subtitle_label)
+        graph.append(f"{video_filter}[v{k}]")
+        graph.append(
+            f"[{2 * k + 1}:a]aformat=sample_rates=44100:channel_layouts=stereo[a{k}]")
+        concat_inputs.append(f"[v{k}][a{k}]")
+
+    graph.append(f"{''.join(concat_inputs)}concat=n={scene_count}:v=1:a=1[vcat][acat]")
+    graph.append(
+        f"[vcat]fade=t=in:st=0:d=1,fade=t=out:st={total_duration - 0.5}:d=0.5[v]")
+
+    if music:
+        graph.append(f"[{music_index}:a]{music[1]}[bg_music]")
+        graph.append("[acat][bg_music]amix=inputs=2:duration=first:dropout_transition=0[a]")
+    else:
+        graph.append("[acat]anull[a]")
+
+    video_map, audio_map, threads, rendition_args = add_renditions(graph, "[v]", "[a]", profile, renditions)
+    command += [
+        "-filter_complex", "; ".join(graph),
+        "-map", video_map,
+        "-map", audio_map,
+        *video_encoder_args(profile, threads),
+        *scene_keyframe_args(scenes, profile),
+        "-c:a", "aac",
+        "-b:a", profile["audio_bitrate"],
+        *container_args(),
+        output_video,
+        *rendition_args,
+    ]
+    return command
+
+
+def create_video_single_pass(ctx, profile):
+    """
+    Render the whole short with one decode/encode pass and no temp files
+    """
     try:
-        command = [
-            "ffmpeg", "-i", audio_path,
-            "-vn", "-f", "null", "-"
-        ]
-        result = subprocess.run(command, stderr=subprocess.PIPE, text=True)
-
-        for line in result.stderr.splitlines():
-            if "Duration" in line:
-                duration_str = line.split()[1].rstrip(',')
-                h, m, s = duration_str.split(":")
-                return float(h) * 3600 + float(m) * 60 + float(s)
-        print(f"Duration not found in FFmpeg output for {audio_path}")
-        return None
+        scenes = collect_scenes(ctx)
+        if not scenes:
+            raise Exception("No renderable scenes found")
+
+        final_command = build_single_pass_command(scenes, ctx.output_video, profile, rendition_paths(ctx))
+
+        logger.info("Rendering %d scenes in a single pass...", len(scenes))
+        logger.debug("Running command: %s", final_command)
+        with timed_encodes() as clock, span(
+                "encode.single_pass", scenes=len(scenes), profile=profile["name"]) as record:
+            with encode_slot():
+                result = subprocess.run(
+                    final_command, stderr=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+
+            if result.returncode != 0:
+                logger.error("FFmpeg stderr output:\n%s", result.stderr)
+                raise subprocess.CalledProcessError(
+                    result.returncode, final_command)
+
+            report = encode_report(profile, ctx.output_video, scenes, clock.seconds)
+            record.update(encode_fps=report["encode_fps"], bitrate_kbps=report["bitrate_kbps"])
+
+        logger.info("Video created successfully!")
+        record_pass_layout(ctx, scenes, profile)
+        return finish_render(ctx, scenes, report)
+
+    except subprocess.CalledProcessError as e:
+        logger.error("FFmpeg Error: %s", e)
     except Exception as e:
-        print(f"Error getting audio duration: {e}")
-        return None
+        logger.error("Error: %s", e)
 
-def create_video_with_audio_and_subtitles(output_dir, audio_dir, output_video):
-    try:
-        watermark_path = "watermark_Scrolla.png"
-        watermark_exists = os.path.exists(watermark_path)
-        watermark_padding_top = 30
-
-        base_dir = os.getcwd()
-        concat_list_path = os.path.join(base_dir, "concat_list.txt")
-        subtitles = read_srt_file('subtitles.srt')
-
-        total_duration = sum(get_audio_duration(os.path.join(audio_dir, f"scene{i}.mp3"))
-                             for i in range(1, len(subtitles) + 1))
-
-        with open(concat_list_path, "w", encoding='utf-8') as f:
-            scene_count = len(
-                [x for x in os.listdir(audio_dir) if x.endswith('.mp3')])
-            print(f"Found {scene_count} audio files")
-
-            for i in range(1, scene_count + 1):
-                image_path = os.path.join(output_dir, f"image{i}.jpg")
-                audio_path = os.path.join(audio_dir, f"scene{i}.mp3")
-                temp_video = os.path.join(base_dir, f"temp_scene_{i}.mp4")
-
-                if not os.path.exists(image_path) or not os.path.exists(audio_path):
-                    print(f"Missing files for scene {i}")
-                    continue
-
-                audio_duration = get_audio_duration(audio_path)
-                if audio_duration is None:
-                    print(f"Could not determine duration for {audio_path}")
-                    continue
-
-                print(f"Processing scene {i} with duration {audio_duration} seconds")
-
-                if ADD_SUBTITLES:
-                    subtitle_text = subtitles[i - 1] if i - 1 < len(subtitles) else ""
-                    wrapped_subtitles = wrap_text(
-                        subtitle_text, max_width=1080 - 40)
-
-                    print(f"Wrapped subtitles for scene {i}: {wrapped_subtitles}")
-
-                    if not wrapped_subtitles:
-                        filter_str = "null"
-                    else:
-                        filter_complex = []
-                        line_spacing = 20
-                        video_height = 1920
-                        total_lines = len(wrapped_subtitles)
-                        vertical_position = calculate_vertical_position(
-                            total_lines, FONT_SIZE, line_spacing, video_height, SUBTITLE_VERTICAL_ALIGNMENT)
-
-                        for idx, seg_text in enumerate(wrapped_subtitles):
-                            seg_text = seg_text.replace(
-                                "'", "'\\''").replace(":", "\\:")
-                            y_position = vertical_position + \
-                                (FONT_SIZE + line_spacing) * idx
-
-                            filter_complex.append(
-                                f"drawtext=text='{seg_text}':fontcolor={FONT_COLOR}:fontsize={FONT_SIZE}:"
-                                f"font='{FONT}':"
-                                f"borderw={BORDER_WIDTH}:bordercolor={BORDER_COLOR}:"
-                                f"box=1:boxcolor=black@0.5:boxborderw=5:"
-                                f"x={SUBTITLE_X_POSITION}:y={y_position}:line_spacing={line_spacing}:"
-                                f"fix_bounds=true:enable='between(t,0,{audio_duration})'"
-                            )
-
-                        subtitle_filter = ','.join(filter_complex)
-                else:
-                    subtitle_filter = "null"
-
-                bg_music_path = "bg_music.mp3"
-                bg_music_exists = os.path.exists(bg_music_path)
-
-                if watermark_exists:
-                    command = [
-                        "ffmpeg", "-y",
-                        "-loop", "1",
-                        "-t", str(audio_duration),
-                        "-i", image_path,
-                        "-i", audio_path,
-                        "-i", watermark_path,
-                        "-filter_complex",
-                        f"[0][2]overlay=(W-w)/2:{watermark_padding_top}[bg]; "
-                        f"[bg]{subtitle_filter},fade=t=in:st=0:d=1,fade=t=out:st={total_duration-0.5}:d=0.5",
-                        "-c:v", "libx264",
-                        "-pix_fmt", "yuv420p",
-                        "-shortest",
-                        "-avoid_negative_ts", "make_zero",
-                        "-r", "30",
-                        temp_video
-                    ]
-                else:
-                    command = [
-                        "ffmpeg", "-y",
-                        "-loop", "1",
-                        "-t", str(audio_duration),
-                        "-i", image_path,
-                        "-i", audio_path,
-                        "-filter_complex",
-                        f"{subtitle_filter},fade=t=in:st=0:d=1,fade=t=out:st={total_duration-0.5}:d=0.5",
-                        "-c:v", "libx264",
-                        "-pix_fmt", "yuv420p",
-                        "-shortest",
-                        "-avoid_negative_ts", "make_zero",
-                        "-r", "30",
-                        temp_video
-                    ]
-
-                print(f"Creating scene {i} with watermark & timed subtitles..." if ADD_SUBTITLES else f"Creating scene {i} without subtitles")
-                subprocess.run(command, check=True)
-
-                f.write(f"file '{os.path.abspath(temp_video)}'\n")
-
-        if not os.path.exists(concat_list_path):
-            raise Exception("Concat list file was not created")
-
-        with open(concat_list_path, 'r') as f:
-            content = f.read().strip()
-            if not content:
-                raise Exception("Concat list file is empty")
-            print("Concat file content:")
-            print(content)
-
-        final_command = [
-            "ffmpeg", "-y",
-            "-f", "concat",
-            "-safe", "0",
-            "-i", concat_list_path,
-            "-i", bg_music_path if bg_music_exists else "null",
-            "-filter_complex",
-            f"[0:v]fade=t=in:st=0:d=1,fade=t=out:st={total_duration-0.5}:d=0.5[v]; "
-            f"[1:a]volume=0.5[bg_music]; "
-            f"[0:a][1:a]amix=inputs=2:duration=first:dropout_transition=0[a]"
-            if bg_music_exists else "[0:v]fade=t=in:st=0:d=1,fade=t=out:st={total_duration-0.5}:d=0.5[v]; [0:a]anull[a]",
-            "-map", "[v]",
-            "-map", "[a]",
-            "-c:v", "libx264",
-            "-c:a", "aac",
-            "-b:a", "384k",
-            "-pix_fmt", "yuv420p",
-            "-shortest",
-            output_video
-        ]
 
-        print("Combining all scenes with background music...")
-        print("Running command:", ' '.join(final_command))
+def create_video_with_audio_and_subtitles(ctx, render_mode=RENDER_MODE, profile=RENDER_PROFILE):
+    """
+    Render the job's images, audio and subtitles into ctx.output_video with the
+    named render profile. Returns the encode report, or None if rendering failed.
+    """
+    profile = render_profile(profile)
+    if render_mode == "single_pass":
+        return create_video_single_pass(ctx, profile)
+    if render_mode == "segments":
+        return create_video_from_scene_segments(ctx, profile)
+    raise ValueError(f"Unsupported render mode: {render_mode}")
+
+
+def build_segment_command(scene, temp_video, profile, fade_in=False, fade_out=False):
+    """
+    Build the ffmpeg command for one scene segment, encoded with the same
+    parameters as every other so they can be joined without re-encoding
+    """
+    watermark = watermark_input()
+
+    command = [
+        "ffmpeg", "-y",
+        "-framerate", str(profile["fps"]),
+        "-i", scene["image"],
+        "-i", scene["audio"],
+    ]
+    watermark_label = subtitle_label = None
+    if watermark:
+        command += ["-i", watermark]
+        watermark_label = "[2:v]"
+    if scene.get("subtitle_overlay"):
+        command += subtitle_input_args(scene)
+        subtitle_label = f"[{3 if watermark else 2}:v]"
+    video_filter = build_still_filter(
+        "[0:v]", scene, profile, watermark_label, subtitle_label, fade_in, fade_out)
+    command += ["-filter_complex", f"{video_filter}[v]"]
+
+    command += [
+        "-map", "[v]",
+        "-map", "1:a",
+        *video_encoder_args(profile),
+        "-c:a", "aac",
+        "-b:a", profile["audio_bitrate"],
+        "-ar", "44100",
+        "-ac", "2",
+        "-shortest",
+        "-avoid_negative_ts", "make_zero",
+        temp_video
+    ]
+    return command
+
+
+def render_scene_segment(scene, temp_video, profile, fade_in=False, fade_out=False):
+    """
+    Encode a single scene to temp_video
+    """
+    command = build_segment_command(scene, temp_video, profile, fade_in, fade_out)
+    logger.info("Creating scene %s with duration %s seconds...", scene["scene_number"], scene["duration"])
+    with encode_slot(), span("encode.segment", scene=scene["scene_number"], profile=profile["name"]):
+        subprocess.run(command, check=True, stderr=subprocess.PIPE, stdout=subprocess.PIPE)
+    return temp_video
+
+
+def segment_key(scene, profile, fade_in=False, fade_out=False):
+    """
+    Content key of a scene segment: hashes of its image and audio files plus
+    everything else that changes its pixels or encoding
+    """
+    return cache_key(
+        SEGMENT_FORMAT_VERSION,
+        file_digest(scene["image"]),
+        file_digest(scene["audio"]),
+        scene["duration"],
+        scene["subtitle"] if ADD_SUBTITLES else "",
+        scene.get("cues") if ADD_SUBTITLES else None,
+        file_digest(WATERMARK_PATH) if os.path.exists(WATERMARK_PATH) else None,
+        VIDEO_WIDTH, VIDEO_HEIGHT, KEN_BURNS, fade_in, fade_out,
+        profile["fps"], profile["audio_bitrate"], video_encoder_args(profile),
+    )
+
+
+def render_scene_segment_cached(ctx, scene, profile, fade_in=False, fade_out=False):
+    """
+    Reuse the job's segment for these inputs and settings, or encode it.
+    Returns (segment path, whether it was encoded).
+    """
+    key = segment_key(scene, profile, fade_in, fade_out)
+    segment = ctx.segment_path(key)
+    if os.path.exists(segment):
+        count("segments_reused")
+        logger.info("Scene %s unchanged, reusing its segment", scene["scene_number"])
+        return segment, False
+
+    os.makedirs(ctx.segments_dir, exist_ok=True)
+    partial = ctx.segment_path(f"{key}.part")
+    render_scene_segment(attach_subtitle_overlay(ctx, scene), partial, profile, fade_in, fade_out)
+    os.replace(partial, segment)
+    return segment, True
+
+
+def record_segments(ctx, scenes, segments):
+    """
+    Store each scene's segment key in the manifest and delete segments that
+    no scene uses any more
+    """
+    update_scene_manifest(ctx, {
+        scene["scene_number"]: {"segment": os.path.splitext(os.path.basename(segment))[0]}
+        for scene, segment in zip(scenes, segments)
+    })
+    keep = {os.path.basename(segment) for segment in segments}
+    for name in os.listdir(ctx.segments_dir):
+        if name not in keep:
+            os.remove(os.path.join(ctx.segments_dir, name))
+
+
+def build_concat_command(concat_list_path, output_video, profile, renditions=None):
+    """
+    Join encoded segments with the concat demuxer (video stream-copied) and
+    encode the renditions ({name: path}) from the joined video
+    """
+    music = music_input()
+
+    command = [
+        "ffmpeg", "-y",
+        "-f", "concat",
+        "-safe", "0",
+        "-i", concat_list_path,
+    ]
+    graph = []
+    audio_label = "[0:a]"
+    if music:
+        command += ["-stream_loop", "-1", "-i", music[0]]
+        graph += [f"[1:a]{music[1]}[bg_music]",
+                  "[0:a][bg_music]amix=inputs=2:duration=first:dropout_transition=0[a]"]
+        audio_label = "[a]"
+
+    video_map, audio_map, _, rendition_args = add_renditions(
+        graph, "[0:v]", audio_label, profile, renditions, main_encoded=False)
+    if graph:
+        command += ["-filter_complex", "; ".join(graph)]
+    command += ["-map", video_map, "-map", audio_map, "-c:v", "copy"]
+    if music:
+        command += ["-c:a", "aac", "-b:a", profile["audio_bitrate"]]
+    else:
+        command += ["-c:a", "copy"]
+
+    command += [*container_args(), output_video, *rendition_args]
+    return command
+
+
+def concat_segments(ctx, temp_videos, profile):
+    """
+    Stream-copy already encoded scene segments (in order) into ctx.output_video
+    """
+    with open(ctx.concat_list_path, "w", encoding='utf-8') as f:
+        for temp_video in temp_videos:
+            f.write(f"file '{os.path.abspath(temp_video)}'\n")
+
+    renditions = rendition_paths(ctx)
+    final_command = build_concat_command(ctx.concat_list_path, ctx.output_video, profile, renditions)
+
+    logger.info("Combining all scenes with background music...")
+    logger.debug("Running command: %s", final_command)
+    # Stream copies need no encoder; rendition encodes take a render slot
+    with encode_slot() if renditions else nullcontext(), span("encode.concat", segments=len(temp_videos)):
         result = subprocess.run(
             final_command, stderr=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
 
-        if result.returncode != 0:
-            print("FFmpeg stderr output:")
-            print(result.stderr)
-            raise subprocess.CalledProcessError(
-                result.returncode, final_command)
+    if result.returncode != 0:
+        logger.error("FFmpeg stderr output:\n%s", result.stderr)
+        raise subprocess.CalledProcessError(
+            result.returncode, final_command, stderr=result.stderr)
+
+    logger.info("Video created successfully!")
 
-        print("Video created successfully!")
 
-        for i in range(1, scene_count + 1):
-            temp_file = os.path.join(base_dir, f"temp_scene_{i}.mp4")
-            if os.path.exists(temp_file):
-                os.remove(temp_file)
-        os.remove(concat_list_path)
+def remove_concat_list(ctx):
+    if os.path.exists(ctx.concat_list_path):
+        os.remove(ctx.concat_list_path)
+
+
+def create_video_from_scene_segments(ctx, profile, max_workers=RENDER_WORKERS):
+    """
+    Encode the scenes' segments concurrently (reusing unchanged ones) and
+    stream-copy them into the final video
+    """
+    try:
+        scenes = collect_scenes(ctx, overlays=False)
+        if not scenes:
+            raise Exception("No renderable scenes found")
+
+        logger.info("Rendering %d scenes with %d workers...", len(scenes), max_workers)
+        with timed_encodes() as clock:
+            with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+                futures = [
+                    submit_in_context(
+                        executor, render_scene_segment_cached, ctx, scene, profile,
+                        k == 0, k == len(scenes) - 1)
+                    for k, scene in enumerate(scenes)
+                ]
+                results = [future.result() for future in futures]
+
+            segments = [segment for segment, _ in results]
+            concat_segments(ctx, segments, profile)
+        record_segments(ctx, scenes, segments)
+        encoded = [scene for scene, (_, was_encoded) in zip(scenes, results) if was_encoded]
+        return finish_render(
+            ctx, scenes, encode_report(profile, ctx.output_video, scenes, clock.seconds, encoded))
 
     except subprocess.CalledProcessError as e:
-        print(f"FFmpeg Error: {e}")
-        print("Command output:", e.output if hasattr(
-            e, 'output') else 'No output available')
+        logger.error("FFmpeg Error: %s", e)
+        logger.error("Command output: %s", e.stderr if e.stderr else 'No output available')
     except Exception as e:
-        print(f"Error: {e}")
-
-        
\ No newline at end of file
+        logger.error("Error: %s", e)
+    finally:
+        remove_concat_list(ctx)
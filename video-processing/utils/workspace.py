@@ -0,0 +1,117 @@
+import os
+import uuid
+import shutil
+from dataclasses import dataclass
+
+JOBS_DIR = os.environ.get("SCROLLA_JOBS_DIR", "jobs")
+
+
+@dataclass
+class JobContext:
+    """
+    Paths for one pipeline run. Every intermediate and output file of a job lives
+    under its own root directory, so concurrent jobs never share state.
+    """
+    job_id: str
+    root: str
+
+    @property
+    def images_dir(self):
+        return os.path.join(self.root, "images")
+
+    @property
+    def audio_dir(self):
+        return os.path.join(self.root, "audios")
+
+    @property
+    def subtitle_overlays_dir(self):
+        return os.path.join(self.root, "subtitle_overlays")
+
+    @property
+    def segments_dir(self):
+        return os.path.join(self.root, "segments")
+
+    @property
+    def srt_path(self):
+        return os.path.join(self.root, "subtitles.srt")
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.root, "scene_manifest.json")
+
+    @property
+    def concat_list_path(self):
+        return os.path.join(self.root, "concat_list.txt")
+
+    @property
+    def output_video(self):
+        return os.path.join(self.root, "output_video.mp4")
+
+    @property
+    def poster_path(self):
+        return os.path.join(self.root, "poster.jpg")
+
+    def rendition_path(self, name):
+        return os.path.join(self.root, f"output_video_{name}.mp4")
+
+    def segment_path(self, segment_key):
+        return os.path.join(self.segments_dir, f"{segment_key}.mp4")
+
+    def image_path(self, scene_number, extension):
+        return os.path.join(self.images_dir, f"image{scene_number}{extension}")
+
+    def find_image(self, scene_number):
+        """
+        Path of a scene's downloaded image, whatever its extension, or None
+        """
+        for extension in (".png", ".jpg", ".jpeg", ".webp"):
+            path = self.image_path(scene_number, extension)
+            if os.path.exists(path):
+                return path
+        return None
+
+    def subtitle_overlay_path(self, scene_number, cue=None):
+        suffix = "" if cue is None else f"_{cue}"
+        return os.path.join(self.subtitle_overlays_dir, f"scene{scene_number}{suffix}.png")
+
+    def caption_list_path(self, scene_number):
+        return os.path.join(self.subtitle_overlays_dir, f"scene{scene_number}.ffconcat")
+
+    def audio_path(self, scene_number):
+        return os.path.join(self.audio_dir, f"scene{scene_number}.mp3")
+
+
+def create_job_context(job_id=None, base_dir=JOBS_DIR):
+    """
+    Create a fresh workspace directory for a job
+    """
+    job_id = job_id or uuid.uuid4().hex
+    ctx = JobContext(job_id=job_id, root=os.path.abspath(os.path.join(base_dir, job_id)))
+    for directory in (ctx.images_dir, ctx.audio_dir):
+        os.makedirs(directory, exist_ok=True)
+    return ctx
+
+
+def open_job_context(job_id, base_dir=JOBS_DIR):
+    """
+    Workspace of an existing job that has a scene manifest, or None
+    """
+    if not job_id or job_id in (".", "..") or os.path.basename(job_id) != job_id:
+        return None
+    ctx = JobContext(job_id=job_id, root=os.path.abspath(os.path.join(base_dir, job_id)))
+    if not os.path.exists(ctx.manifest_path):
+        return None
+    return ctx
+
+
+def cleanup_job_context(ctx, keep_output=True):
+    """
+    Remove a job's intermediates (or the whole workspace with keep_output=False)
+    """
+    if not keep_output:
+        shutil.rmtree(ctx.root, ignore_errors=True)
+        return
+    shutil.rmtree(ctx.subtitle_overlays_dir, ignore_errors=True)
+    for name in os.listdir(ctx.root):
+        if name.startswith("temp_scene_") or name == "concat_list.txt":
+            os.remove(os.path.join(ctx.root, name))